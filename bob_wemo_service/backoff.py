@@ -0,0 +1,135 @@
+#!/usr/bin/python3
+""" backoff.py:
+    Negative-result cache for devices that could not be found on the network
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import logging
+import random
+import time
+from bob_wemo_service.device_registry import normalize_name
+
+
+# Authorship Info *************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2017, The B.O.B. Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Backoff entry definition ****************************************************
+class BackoffEntry(object):
+    """ Failure history for a single device """
+    __slots__ = ('name', 'addr', 'failures', 'delay', 'retry_at')
+
+    def __init__(self, name=None, addr=None):
+        self.name = name
+        self.addr = addr
+        self.failures = 0
+        self.delay = 0.0
+        self.retry_at = 0.0
+
+
+# Discovery backoff class definition ******************************************
+class DiscoveryBackoff(object):
+    """ Records devices whose discovery failed and how long to wait before
+        trying them again.  The wait doubles on each consecutive failure, is
+        randomized by +/- jitter, and never exceeds the maximum.
+    """
+    def __init__(self, logger=None, initial=5.0, maximum=300.0, factor=2.0,
+                 jitter=0.2, clock=None):
+        # Configure loggers
+        self.logger = logger or logging.getLogger(__name__)
+        # Backoff parameters
+        self.initial = float(initial)
+        self.maximum = float(maximum)
+        self.factor = float(factor)
+        self.jitter = float(jitter)
+        self.clock = clock or time.monotonic
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name):
+        return normalize_name(name) in self._entries
+
+    def record_failure(self, name, addr=None, now=None):
+        """ Records a failed discovery and schedules the next retry.  Returns
+            the number of seconds until the device may be tried again
+        """
+        now = self.clock() if now is None else now
+        key = normalize_name(name)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = BackoffEntry(name=name, addr=addr)
+            self._entries[key] = entry
+        if addr is not None:
+            entry.addr = addr
+        entry.failures += 1
+        delay = min(
+            self.maximum,
+            self.initial * (self.factor ** (entry.failures - 1))
+        )
+        delay *= 1.0 + self.jitter * (2.0 * random.random() - 1.0)
+        entry.delay = max(0.0, min(self.maximum, delay))
+        entry.retry_at = now + entry.delay
+        self.logger.debug(
+            'Discovery of %s failed %s time(s).  Backing off for %.1f seconds',
+            name,
+            entry.failures,
+            entry.delay
+        )
+        return entry.delay
+
+    def record_success(self, name):
+        """ Clears any failure history for a device.  Returns True if the
+            device had been backing off
+        """
+        entry = self._entries.pop(normalize_name(name), None)
+        if entry is not None:
+            self.logger.debug(
+                'Device %s found again after %s failure(s)',
+                name,
+                entry.failures
+            )
+            return True
+        return False
+
+    def names(self):
+        """ Returns the names of every device with a failure history """
+        return [entry.name for entry in self._entries.values()]
+
+    def is_blocked(self, name, now=None):
+        """ Returns True while a device is inside its backoff window """
+        entry = self._entries.get(normalize_name(name))
+        if entry is None:
+            return False
+        now = self.clock() if now is None else now
+        return now < entry.retry_at
+
+    def due(self, now=None):
+        """ Returns a list of (name, addr) tuples for devices whose backoff
+            window has expired
+        """
+        now = self.clock() if now is None else now
+        return [
+            (entry.name, entry.addr) for entry in self._entries.values()
+            if now >= entry.retry_at
+        ]
+
+    def next_retry(self, now=None):
+        """ Returns the number of seconds until the next retry is due, or
+            None if no device is backing off
+        """
+        if len(self._entries) == 0:
+            return None
+        now = self.clock() if now is None else now
+        return max(
+            0.0,
+            min(entry.retry_at for entry in self._entries.values()) - now
+        )
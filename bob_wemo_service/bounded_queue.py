@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+""" bounded_queue.py:
+    Bounded message queue with a selectable overload policy
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import asyncio
+import collections
+import logging
+
+
+# Authorship Info *************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2017, The B.O.B. Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+REJECT = 'reject'
+DROP_OLDEST = 'drop_oldest'
+DROP_DUPLICATE = 'drop_duplicate'
+BLOCK = 'block'
+POLICIES = (REJECT, DROP_OLDEST, DROP_DUPLICATE, BLOCK)
+
+
+# Message key helper **********************************************************
+def field_key(*indexes):
+    """ Returns a function keying a comma separated message by the fields at
+        the given positions """
+    def key(msg):
+        fields = msg.split(',')
+        return tuple(
+            fields[index] if index < len(fields) else None for index in indexes
+        )
+    return key
+
+
+# Bounded queue class definition **********************************************
+class BoundedQueue(asyncio.Queue):
+    """ asyncio queue holding at most maxsize messages.  offer() applies the
+        overload policy when the queue is full:
+            reject          refuse the new message
+            drop_oldest     discard the oldest queued message
+            drop_duplicate  discard the oldest queued message with the same
+                            key as the new one, refusing the new message if
+                            there is none
+            block           refuse the new message; callers wanting to wait
+                            for room use put() instead
+        Every message shed is counted by reason.
+    """
+    def __init__(self, maxsize=0, policy=REJECT, key=None, logger=None):
+        super(BoundedQueue, self).__init__(maxsize=int(maxsize))
+        # Configure loggers
+        self.logger = logger or logging.getLogger(__name__)
+        if policy not in POLICIES:
+            self.logger.warning('Unknown queue policy [%s].  Using reject', policy)
+            policy = REJECT
+        self.policy = policy
+        self.key = key or (lambda item: item)
+        self.shed = collections.Counter()
+
+    @property
+    def blocking(self):
+        """ Returns True if producers should wait for room with put() """
+        return self.policy == BLOCK
+
+    def offer(self, item):
+        """ Adds an item without waiting, applying the overload policy if
+            the queue is full.  Returns True if the item was queued
+        """
+        if self.full():
+            if self.policy == DROP_OLDEST:
+                self._discard(0, 'dropped_oldest')
+            elif self.policy == DROP_DUPLICATE:
+                item_key = self.key(item)
+                for index, queued in enumerate(self._queue):
+                    if self.key(queued) == item_key:
+                        self._discard(index, 'dropped_duplicate')
+                        break
+            if self.full():
+                self.shed['rejected'] += 1
+                self.logger.debug('Queue full.  Rejected: [%s]', item)
+                return False
+        self.put_nowait(item)
+        return True
+
+    def _discard(self, index, reason):
+        """ Removes a queued item to make room for a new one """
+        dropped = self._queue[index]
+        del self._queue[index]
+        self.task_done()
+        self.shed[reason] += 1
+        self.logger.debug('Queue full.  Discarded (%s): [%s]', reason, dropped)
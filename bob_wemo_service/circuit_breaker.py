@@ -0,0 +1,188 @@
+#!/usr/bin/python3
+""" circuit_breaker.py:
+    Per-device circuit breakers around calls to the physical devices
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import collections
+import logging
+import threading
+import time
+from bob_wemo_service.device_registry import normalize_name
+
+
+# Authorship Info *************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2017, The B.O.B. Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+# Circuit breaker class definition ********************************************
+class CircuitBreaker(object):
+    """ Tracks the outcome of the most recent calls to a single device.  The
+        breaker opens once the failure rate over the window reaches the
+        threshold, rejects calls for the cooldown period, then lets a single
+        probe call through.  A successful probe closes the breaker again and
+        a failed one re-opens it.
+    """
+    def __init__(self, name, threshold=0.5, min_calls=4, window=10,
+                 cooldown=30.0):
+        self.name = name
+        self.threshold = float(threshold)
+        self.min_calls = int(min_calls)
+        self.cooldown = float(cooldown)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.results = collections.deque(maxlen=int(window))
+
+    @property
+    def failure_rate(self):
+        """ Returns the fraction of failed calls in the window """
+        if len(self.results) == 0:
+            return 0.0
+        return self.results.count(False) / len(self.results)
+
+    def allow(self, now):
+        """ Returns True if a call may be made.  Moves an open breaker to
+            half-open once its cooldown has expired, allowing one probe
+        """
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if now < self.opened_at + self.cooldown:
+                return False
+            self.state = HALF_OPEN
+            self.probing = False
+        if self.probing is True:
+            return False
+        self.probing = True
+        return True
+
+    def record(self, success, now):
+        """ Records the outcome of a call.  Returns the new state if the
+            breaker changed state, otherwise None
+        """
+        previous = self.state
+        if self.state == HALF_OPEN:
+            self.probing = False
+            self.results.clear()
+            if success is True:
+                self.state = CLOSED
+            else:
+                self.state = OPEN
+                self.opened_at = now
+        elif self.state == CLOSED:
+            self.results.append(success is True)
+            if len(self.results) >= self.min_calls and \
+                    self.failure_rate >= self.threshold:
+                self.state = OPEN
+                self.opened_at = now
+        if self.state != previous:
+            return self.state
+        return None
+
+
+# Breaker board class definition **********************************************
+class BreakerBoard(object):
+    """ Holds one circuit breaker per device along with counters of breaker
+        activity.  Safe to call from the gateway thread pool.
+    """
+    def __init__(self, logger=None, threshold=0.5, min_calls=4, window=10,
+                 cooldown=30.0, clock=None):
+        # Configure loggers
+        self.logger = logger or logging.getLogger(__name__)
+        # Breaker parameters
+        self.threshold = float(threshold)
+        self.min_calls = int(min_calls)
+        self.window = int(window)
+        self.cooldown = float(cooldown)
+        self.clock = clock or time.monotonic
+        self.counters = collections.Counter()
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, name):
+        """ Returns the breaker for a device, creating it if needed """
+        key = normalize_name(name)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    name,
+                    threshold=self.threshold,
+                    min_calls=self.min_calls,
+                    window=self.window,
+                    cooldown=self.cooldown
+                )
+                self._breakers[key] = breaker
+            return breaker
+
+    def state(self, name):
+        """ Returns the breaker state of a device """
+        with self._lock:
+            breaker = self._breakers.get(normalize_name(name))
+            return CLOSED if breaker is None else breaker.state
+
+    def allow(self, name, now=None):
+        """ Returns True if a call to a device may be made """
+        breaker = self.breaker(name)
+        now = self.clock() if now is None else now
+        with self._lock:
+            was_open = breaker.state == OPEN
+            allowed = breaker.allow(now)
+            if allowed is False:
+                self.counters['rejected'] += 1
+            elif breaker.state == HALF_OPEN:
+                self.counters['probes'] += 1
+                if was_open is True:
+                    self.logger.info(
+                        'Circuit breaker for [%s] half-open.  Probing device',
+                        name
+                    )
+        return allowed
+
+    def record_success(self, name, now=None):
+        """ Records a successful call to a device """
+        self._record(name, True, now)
+
+    def record_failure(self, name, now=None):
+        """ Records a failed call to a device """
+        self._record(name, False, now)
+
+    def _record(self, name, success, now):
+        breaker = self.breaker(name)
+        now = self.clock() if now is None else now
+        with self._lock:
+            changed = breaker.record(success, now)
+            if changed == OPEN:
+                self.counters['opened'] += 1
+                self.logger.warning(
+                    'Circuit breaker for [%s] opened.  Calls rejected for %s '
+                    'seconds',
+                    name,
+                    self.cooldown
+                )
+            elif changed == CLOSED:
+                self.counters['closed'] += 1
+                self.logger.info('Circuit breaker for [%s] closed', name)
+
+    def stats(self):
+        """ Returns a dict of breaker counters and the devices whose breaker
+            is not closed """
+        with self._lock:
+            stats = dict(self.counters)
+            for breaker in self._breakers.values():
+                if breaker.state != CLOSED:
+                    stats.setdefault(breaker.state, []).append(breaker.name)
+            return stats
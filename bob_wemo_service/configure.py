@@ -71,6 +71,7 @@ class ConfigureService(object):
         self.filename = filename
         self.service_addresses = {}
         self.message_types = {}
+        self.gateway_settings = {}
         self.handlers = []
         self.filters = []
         self.formatters = []
@@ -188,6 +189,17 @@ class ConfigureService(object):
         return self.message_types
 
 
+    def get_gateway_settings(self):
+        """ Create dict with wemo gateway tuning parameters defined in INI file
+        """
+        self.config_file.read(self.filename)
+        if self.config_file.has_section('WEMO GATEWAY'):
+            for option in self.config_file.options('WEMO GATEWAY'):
+                self.gateway_settings[option] = self.config_file['WEMO GATEWAY'][option]
+        # Return dict of gateway settings to main program
+        return self.gateway_settings
+
+
     def get_devices(self):
         """ Create list of devices the system should expect to exist
         """
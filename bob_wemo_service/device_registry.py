@@ -0,0 +1,288 @@
+#!/usr/bin/python3
+""" device_registry.py:
+    Indexed registry of wemo devices discovered on the network
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import json
+import logging
+import os
+import threading
+
+
+# Authorship Info *************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2017, The B.O.B. Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Name normalization helper ***************************************************
+def normalize_name(name):
+    """ Returns the lookup key used for a device name """
+    if name is None:
+        return str()
+    return str(name).strip().lower()
+
+
+# Registry entry definition ***************************************************
+class RegistryEntry(object):
+    """ Record held by the registry for a single physical device """
+    __slots__ = ('name', 'addr', 'port', 'url', 'udn', 'model', 'mac', 'device')
+
+    # Fields written to the registry file
+    PERSISTED = ('name', 'addr', 'port', 'url', 'udn', 'model', 'mac')
+
+    def __init__(self, name=None, addr=None, port=None, url=None, udn=None,
+                 model=None, mac=None, device=None):
+        self.name = name
+        self.addr = addr
+        self.port = port
+        self.url = url
+        self.udn = udn
+        self.model = model
+        self.mac = mac
+        self.device = device
+
+    @property
+    def key(self):
+        """ Normalized device name used as the primary index """
+        return normalize_name(self.name)
+
+    def record(self):
+        """ Returns the persisted fields of the entry as a dict """
+        return dict((field, getattr(self, field)) for field in self.PERSISTED)
+
+    def __repr__(self):
+        return 'RegistryEntry(name=%r, addr=%r, port=%r, udn=%r)' % (
+            self.name, self.addr, self.port, self.udn)
+
+
+# Registry class definition ***************************************************
+class WemoRegistry(object):
+    """ Registry of known devices keyed by normalized name with secondary
+        indexes by IP address and UDN.  Re-registering a device that is
+        already known updates its entry in place.
+    """
+    def __init__(self, logger=None):
+        # Configure loggers
+        self.logger = logger or logging.getLogger(__name__)
+        # Primary and secondary indexes
+        self._by_name = {}
+        self._by_addr = {}
+        self._by_udn = {}
+        self._ports = {}
+        self._lock = threading.RLock()
+        # Set whenever a persisted field changes
+        self.dirty = False
+
+    def __len__(self):
+        with self._lock:
+            return len(self._by_name)
+
+    def __contains__(self, name):
+        with self._lock:
+            return normalize_name(name) in self._by_name
+
+    @property
+    def entries(self):
+        """ Returns a snapshot list of all registry entries """
+        with self._lock:
+            return list(self._by_name.values())
+
+    @property
+    def devices(self):
+        """ Returns a snapshot list of all known device handles """
+        with self._lock:
+            return [
+                entry.device for entry in self._by_name.values()
+                if entry.device is not None
+            ]
+
+    def by_name(self, name):
+        """ Returns the entry for a device name, or None """
+        with self._lock:
+            return self._by_name.get(normalize_name(name))
+
+    def by_addr(self, addr):
+        """ Returns the entry for an IP address, or None """
+        with self._lock:
+            return self._by_addr.get(addr)
+
+    def by_udn(self, udn):
+        """ Returns the entry for a device UDN, or None """
+        with self._lock:
+            return self._by_udn.get(udn)
+
+    def update(self, device=None, name=None, addr=None, udn=None, **fields):
+        """ Adds a device to the registry or updates the existing entry for
+            it.  Name and address default to the attributes of the device
+            handle.  Any other persisted field (port, url, model, mac) may be
+            passed as a keyword.  Returns the resulting entry.
+        """
+        if name is None:
+            name = getattr(device, 'name', None)
+        if addr is None:
+            addr = getattr(device, 'host', None)
+        if not normalize_name(name):
+            self.logger.warning('Cannot register device without a name: %s', device)
+            return None
+        with self._lock:
+            # Locate any existing record, preferring the UDN which survives
+            # a rename of the device
+            entry = None
+            if udn is not None:
+                entry = self._by_udn.get(udn)
+            if entry is None:
+                entry = self._by_name.get(normalize_name(name))
+            if entry is None:
+                entry = RegistryEntry()
+                self.logger.debug('Adding new registry entry for: %s', name)
+            else:
+                self.logger.debug('Updating registry entry for: %s', name)
+                self._unindex(entry)
+            # A different record already holding the name is superseded
+            clash = self._by_name.get(normalize_name(name))
+            if clash is not None and clash is not entry:
+                self._unindex(clash)
+            # Update record in place and re-index it
+            before = entry.record()
+            entry.name = name
+            if addr is not None:
+                entry.addr = addr
+            if udn is not None:
+                entry.udn = udn
+            for field, value in fields.items():
+                if field in RegistryEntry.PERSISTED and value is not None:
+                    setattr(entry, field, value)
+            if device is not None:
+                entry.device = device
+            self._index(entry)
+            if entry.record() != before:
+                self.dirty = True
+            self.remember_port(entry.addr, entry.port)
+            return entry
+
+    def port_for(self, addr):
+        """ Returns the last port a device at an IP address answered on, or
+            None if no port is known """
+        with self._lock:
+            return self._ports.get(addr)
+
+    def remember_port(self, addr, port):
+        """ Records the port a device at an IP address answered on """
+        if addr is None or port is None:
+            return
+        with self._lock:
+            if self._ports.get(addr) != port:
+                self._ports[addr] = port
+                self.dirty = True
+
+    def forget_port(self, addr):
+        """ Drops the remembered port for an IP address """
+        with self._lock:
+            if self._ports.pop(addr, None) is not None:
+                self.dirty = True
+
+    def detach(self, udn):
+        """ Drops the live device handle held for a UDN while keeping its
+            saved location.  Returns the entry, or None if unknown
+        """
+        with self._lock:
+            entry = self._by_udn.get(udn)
+            if entry is not None:
+                entry.device = None
+                self.logger.debug('Detached device handle for: %s', entry.name)
+            return entry
+
+    def remove(self, name):
+        """ Removes a device from the registry.  Returns the removed entry,
+            or None if the name was not known
+        """
+        with self._lock:
+            entry = self._by_name.get(normalize_name(name))
+            if entry is not None:
+                self._unindex(entry)
+                self.dirty = True
+                self.logger.debug('Removed registry entry for: %s', name)
+            return entry
+
+    def save(self, filename):
+        """ Writes the persisted fields of every entry to a JSON file.  The
+            file is replaced atomically so a crash never leaves it truncated.
+        """
+        with self._lock:
+            records = [entry.record() for entry in self._by_name.values()]
+            ports = dict(self._ports)
+            folder = os.path.dirname(filename)
+            if len(folder) > 0:
+                os.makedirs(folder, exist_ok=True)
+            temp_name = filename + '.tmp'
+            with open(temp_name, 'w') as temp_file:
+                json.dump(
+                    {'devices': records, 'ports': ports},
+                    temp_file,
+                    indent=2,
+                    sort_keys=True
+                )
+            os.replace(temp_name, filename)
+            self.dirty = False
+            self.logger.debug('Saved %s registry entries to: %s', len(records), filename)
+
+    def load(self, filename):
+        """ Adds the entries held in a JSON registry file.  Entries are loaded
+            without device handles.  Returns the number of entries loaded.
+        """
+        try:
+            with open(filename, 'r') as registry_file:
+                contents = json.load(registry_file)
+        except FileNotFoundError:
+            self.logger.info('No saved device registry found at: %s', filename)
+            return 0
+        except (OSError, ValueError):
+            self.logger.warning('Could not read device registry file: %s', filename)
+            return 0
+        count = 0
+        with self._lock:
+            for record in contents.get('devices', []):
+                fields = dict(
+                    (field, record.get(field)) for field in RegistryEntry.PERSISTED
+                )
+                if self.update(**fields) is not None:
+                    count += 1
+            for addr, port in contents.get('ports', {}).items():
+                self.remember_port(addr, int(port))
+            self.dirty = False
+        self.logger.info('Loaded %s saved registry entries from: %s', count, filename)
+        return count
+
+    def _index(self, entry):
+        """ Adds an entry to every index it has a key for """
+        # Drop stale holders of the same address or UDN
+        if entry.addr is not None:
+            other = self._by_addr.get(entry.addr)
+            if other is not None and other is not entry:
+                self.logger.debug(
+                    'Address %s moved from %s to %s',
+                    entry.addr,
+                    other.name,
+                    entry.name
+                )
+                other.addr = None
+            self._by_addr[entry.addr] = entry
+        if entry.udn is not None:
+            self._by_udn[entry.udn] = entry
+        self._by_name[entry.key] = entry
+
+    def _unindex(self, entry):
+        """ Removes an entry from every index that points at it """
+        if self._by_name.get(entry.key) is entry:
+            del self._by_name[entry.key]
+        if entry.addr is not None and self._by_addr.get(entry.addr) is entry:
+            del self._by_addr[entry.addr]
+        if entry.udn is not None and self._by_udn.get(entry.udn) is entry:
+            del self._by_udn[entry.udn]
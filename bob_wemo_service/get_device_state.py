@@ -37,6 +37,7 @@ class GetDeviceStateMessage(object):
         self._dev_addr = str()
         self._dev_status = str()
         self._dev_last_seen = str()
+        self._force = False
         self.temp_list = []
         # Process input variables if present
         if kwargs is not None:
@@ -81,6 +82,10 @@ class GetDeviceStateMessage(object):
                     self.dev_last_seen = value
                     self.logger.debug('Device last seen value set during __init__ '
                                       'to: %s', self.dev_last_seen)
+                if key == "force":
+                    self.force = value
+                    self.logger.debug('Force update value set during __init__ '
+                                      'to: %s', self.force)
 
     # ref number field ********************************************************
     @property
@@ -243,6 +248,21 @@ class GetDeviceStateMessage(object):
             logger=self.logger)
         self.logger.debug('Device last seen updated to: %s', self._dev_last_seen)
 
+    # force update field *******************************************************
+    @property
+    def force(self):
+        self.logger.debug('Returning current value of force update: '
+                          '%s', self._force)
+        return self._force
+
+    @force.setter
+    def force(self, value):
+        if isinstance(value, bool):
+            self._force = value
+        else:
+            self._force = str(value).strip().lower() in ['1', 'true', 'force']
+        self.logger.debug('Force update value updated to: %s', self._force)
+
     # complete message encode/decode methods **********************************
     @property
     def complete(self):
@@ -252,6 +272,13 @@ class GetDeviceStateMessage(object):
                           self._source_addr, self._source_port,
                           self._msg_type, self._dev_name, self._dev_addr,
                           self._dev_status, self._dev_last_seen)
+        # The optional force update field is only sent when set
+        if self._force is True:
+            return '%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,1' % (
+                self._ref, self._dest_addr, self._dest_port,
+                self._source_addr, self._source_port,
+                self._msg_type, self._dev_name, self._dev_addr,
+                self._dev_status, self._dev_last_seen)
         return '%s,%s,%s,%s,%s,%s,%s,%s,%s,%s' % (
             self._ref, self._dest_addr, self._dest_port,
             self._source_addr, self._source_port,
@@ -274,3 +301,7 @@ class GetDeviceStateMessage(object):
                 self.dev_addr = self.temp_list[7]
                 self.dev_status = self.temp_list[8]
                 self.dev_last_seen = self.temp_list[9]
+                if len(self.temp_list) >= 11:
+                    self.force = self.temp_list[10]
+                else:
+                    self.force = False
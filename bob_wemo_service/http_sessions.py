@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+""" http_sessions.py:
+    Keep-alive HTTP sessions for the SOAP calls pywemo makes to each device
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+
+
+# Authorship Info *************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2017, The B.O.B. Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Session pool entry definition ***********************************************
+class SessionEntry(object):
+    """ Session held open to a single device endpoint """
+    __slots__ = ('host', 'session', 'used')
+
+    def __init__(self, host=None, session=None, used=0.0):
+        self.host = host
+        self.session = session
+        self.used = used
+
+
+# Session pool class definition ***********************************************
+class SessionPool(object):
+    """ Stand-in for the requests module inside pywemo's service layer.
+        post() is routed through a keep-alive session per device host and
+        port, so repeated SOAP calls reuse one TCP connection.  Sessions are
+        dropped after a failed request, after sitting idle for longer than
+        the device keeps connections open, and when a device is
+        rediscovered.  Every other attribute is passed through to requests.
+        New sessions are created by factory, requests.Session by default.
+    """
+    def __init__(self, logger=None, max_idle=30.0, clock=None, factory=None):
+        # Configure loggers
+        self.logger = logger or logging.getLogger(__name__)
+        self.max_idle = float(max_idle)
+        self.clock = clock or time.monotonic
+        self.factory = factory or requests.Session
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def install(self):
+        """ Routes pywemo SOAP calls through the pool.  Returns True if the
+            pywemo service layer was found """
+        try:
+            from pywemo.ouimeaux_device.api import service
+        except ImportError:
+            self.logger.warning('pywemo service layer not found.  Keep-alive disabled')
+            return False
+        if getattr(service, 'requests', None) is not requests:
+            self.logger.warning('pywemo does not use requests.  Keep-alive disabled')
+            return False
+        service.requests = self
+        self.logger.info('Keep-alive sessions enabled for wemo SOAP calls')
+        return True
+
+    def session(self, url):
+        """ Returns the session for the endpoint of a URL, replacing one that
+            has been idle for too long """
+        netloc = urlparse(url).netloc
+        now = self.clock()
+        with self._lock:
+            entry = self._sessions.get(netloc)
+            if entry is not None and now - entry.used > self.max_idle:
+                self.logger.debug('Closing idle session to: %s', netloc)
+                entry.session.close()
+                entry = None
+            if entry is None:
+                self.logger.debug('Opening keep-alive session to: %s', netloc)
+                entry = SessionEntry(host=urlparse(url).hostname, session=self.factory())
+                self._sessions[netloc] = entry
+            entry.used = now
+            return entry.session
+
+    def post(self, url, *args, **kwargs):
+        """ Sends a POST through the session for its endpoint.  A failed
+            request drops the session so the retry opens a new connection """
+        try:
+            return self.session(url).post(url, *args, **kwargs)
+        except requests.exceptions.RequestException:
+            self.evict(urlparse(url).hostname)
+            raise
+
+    def evict(self, host):
+        """ Closes every session held to a device host """
+        with self._lock:
+            for netloc, entry in list(self._sessions.items()):
+                if entry.host == host:
+                    self.logger.debug('Evicting session to: %s', netloc)
+                    entry.session.close()
+                    del self._sessions[netloc]
+
+    def close(self):
+        """ Closes every open session """
+        with self._lock:
+            for entry in self._sessions.values():
+                entry.session.close()
+            self._sessions = {}
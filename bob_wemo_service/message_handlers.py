@@ -5,6 +5,9 @@
 # Import Required Libraries (Standard, Third Party, Local) ********************
 import asyncio
 import logging
+import time
+from bob_wemo_service.bounded_queue import BoundedQueue
+from bob_wemo_service.bounded_queue import field_key
 
 
 # Authorship Info *************************************************************
@@ -20,13 +23,58 @@ __status__ = "Development"
 
 # Message Handler Class Def ***************************************************
 class MessageHandler(object):
-    def __init__(self, loop, logger=None):
+    def __init__(self, loop, logger=None, **kwargs):
         # Configure loggers
         self.logger = logger or logging.getLogger(__name__)
 
         self.loop = loop
-        self.msg_in_queue = asyncio.Queue()
-        self.msg_out_queue = asyncio.Queue()
+        self.in_maxsize = 0
+        self.in_policy = 'reject'
+        self.out_maxsize = 0
+        self.out_policy = 'drop_oldest'
+        # Map input variables
+        if kwargs is not None:
+            for key, value in kwargs.items():
+                if key == "in_maxsize":
+                    self.in_maxsize = int(value)
+                    self.logger.debug(
+                        'Inbound queue bound set during __init__ to: %s',
+                        self.in_maxsize
+                    )
+                if key == "in_policy":
+                    self.in_policy = value
+                    self.logger.debug(
+                        'Inbound queue policy set during __init__ to: %s',
+                        self.in_policy
+                    )
+                if key == "out_maxsize":
+                    self.out_maxsize = int(value)
+                    self.logger.debug(
+                        'Outbound queue bound set during __init__ to: %s',
+                        self.out_maxsize
+                    )
+                if key == "out_policy":
+                    self.out_policy = value
+                    self.logger.debug(
+                        'Outbound queue policy set during __init__ to: %s',
+                        self.out_policy
+                    )
+        # Duplicates are messages of the same type about the same device
+        # from (inbound) or to (outbound) the same service.  Inbound
+        # messages are queued as (arrival time, message) tuples.
+        in_key = field_key(3, 4, 5, 6)
+        self.msg_in_queue = BoundedQueue(
+            maxsize=self.in_maxsize,
+            policy=self.in_policy,
+            key=lambda item: in_key(item[1]),
+            logger=self.logger
+        )
+        self.msg_out_queue = BoundedQueue(
+            maxsize=self.out_maxsize,
+            policy=self.out_policy,
+            key=field_key(1, 2, 5, 6),
+            logger=self.logger
+        )
         self.data_in = None
         self.message = None
         self.addr = None
@@ -40,7 +88,6 @@ class MessageHandler(object):
         self.writer_out = None
         self.ack = str()
         self.data_ack = str()
-        self.sleep_time = 0.2
 
     # Incoming message handler ************************************************
     @asyncio.coroutine
@@ -64,24 +111,37 @@ class MessageHandler(object):
 
         # Coping incoming message to message buffer
         self.logger.debug('Received message: %s', self.message)
-        self.msg_in_queue.put_nowait(self.message)
+        message = self.message
+        stamped = (time.monotonic(), message)
+        if self.msg_in_queue.blocking is True:
+            # Hold the sender until there is room
+            yield from self.msg_in_queue.put(stamped)
+            accepted = True
+        else:
+            accepted = self.msg_in_queue.offer(stamped)
         self.logger.debug('Resulting buffer length: %s',
                           str(self.msg_in_queue.qsize()))
 
-        # Acknowledge receipt of message
-        self.logger.debug("ACK'ing message: %r", self.message)
+        # Acknowledge receipt of message, or NACK one the queue refused
         self.logger.debug('Splitting message into constituent parts')
-        self.msg_seg = self.message.split(',')
+        self.msg_seg = message.split(',')
         self.logger.debug(
             'Extracted msg sequence number: [%s]',
             self.msg_seg[0]
         )
-        self.ack_to_send = self.msg_seg[0].encode()
+        if accepted is True:
+            self.logger.debug("ACK'ing message: %r", message)
+            self.ack_to_send = self.msg_seg[0].encode()
+        else:
+            self.logger.warning('Inbound queue full.  NACKing message: %r', message)
+            self.ack_to_send = (self.msg_seg[0] + ',NACK').encode()
         self.logger.debug('Sending ACK: %s', self.ack_to_send)
-        self.writer.write(self.ack_to_send)
+        # Use this connection's writer; the shared fields may belong to
+        # another connection after waiting for queue room
+        writer.write(self.ack_to_send)
         yield from writer.drain()
         self.logger.debug('Closing the socket after sending ACK')
-        self.writer.close()
+        writer.close()
 
 
     # Outgoing message handler ************************************************
@@ -89,44 +149,39 @@ class MessageHandler(object):
     def handle_msg_out(self):
         """ task to handle outgoing messages """
         while True:
-            self.sleep_time = 0.2
-            if self.msg_out_queue.qsize() > 0:
-                self.sleep_time = 0.05
-                self.logger.debug(
-                    'Pulling next outgoing message from queue'
-                )
-                self.msg_to_send = self.msg_out_queue.get_nowait()
-                self.logger.debug(
-                    'Preparing to send message: %s',
-                    self.msg_to_send
-                )
-                self.logger.debug(
-                    'Extracting msg destination address and port'
-                )
-                self.msg_seg_out = self.msg_to_send.split(',')
-                self.logger.debug(
-                    'Opening outgoing connection to %s:%s',
+            self.logger.debug(
+                'Waiting for next outgoing message from queue'
+            )
+            self.msg_to_send = yield from self.msg_out_queue.get()
+            self.logger.debug(
+                'Preparing to send message: %s',
+                self.msg_to_send
+            )
+            self.logger.debug(
+                'Extracting msg destination address and port'
+            )
+            self.msg_seg_out = self.msg_to_send.split(',')
+            self.logger.debug(
+                'Opening outgoing connection to %s:%s',
+                self.msg_seg_out[1],
+                self.msg_seg_out[2]
+            )
+            try:
+                self.reader_out, self.writer_out = yield from asyncio.open_connection(
                     self.msg_seg_out[1],
-                    self.msg_seg_out[2]
+                    int(self.msg_seg_out[2]),
+                    loop=self.loop
                 )
-                try:
-                    self.reader_out, self.writer_out = yield from asyncio.open_connection(
-                        self.msg_seg_out[1],
-                        int(self.msg_seg_out[2]),
-                        loop=self.loop
-                    )
-                    self.logger.debug('Sending message: %s', self.msg_to_send)
-                    self.writer_out.write(self.msg_to_send.encode())
+                self.logger.debug('Sending message: %s', self.msg_to_send)
+                self.writer_out.write(self.msg_to_send.encode())
 
-                    self.logger.debug('Waiting for ack')
-                    self.data_ack = yield from self.reader_out.read(200)
-                    self.ack = self.data_ack.decode()
-                    self.logger.debug('Received ACK: %r', self.ack)
-                    self.logger.debug('Closing socket')
-                    self.writer_out.close()
-                except Exception:
-                    self.logger.warning(
-                        'Could not open socket connection to target'
-                    )
-            # Yield to other tasks for a while
-            yield from asyncio.sleep(self.sleep_time)
+                self.logger.debug('Waiting for ack')
+                self.data_ack = yield from self.reader_out.read(200)
+                self.ack = self.data_ack.decode()
+                self.logger.debug('Received ACK: %r', self.ack)
+                self.logger.debug('Closing socket')
+                self.writer_out.close()
+            except Exception:
+                self.logger.warning(
+                    'Could not open socket connection to target'
+                )
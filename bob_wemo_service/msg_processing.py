@@ -12,6 +12,7 @@ from bob_wemo_service.get_device_state import GetDeviceStateMessage
 from bob_wemo_service.get_device_state_ack import GetDeviceStateMessageACK
 from bob_wemo_service.set_device_state import SetDeviceStateMessage
 from bob_wemo_service.set_device_state_ack import SetDeviceStateMessageACK
+from bob_wemo_service.wemo_result import WemoResult
 
 
 # Authorship Info *************************************************************
@@ -86,7 +87,7 @@ def process_heartbeat_msg(logger, ref_num, msg, message_types):
 
 # Internal Service Work Subtask - wemo get status *****************************
 @asyncio.coroutine
-def get_wemo_state(logger, ref_num, wemo_gw, msg, message_types):
+def get_wemo_state(logger, ref_num, wemo_gw, msg, message_types, deadline=None):
     """ Function to properly process wemo device status requests """
     # Configure loggers
     logger = logger or logging.getLogger(__name__)
@@ -107,10 +108,19 @@ def get_wemo_state(logger, ref_num, wemo_gw, msg, message_types):
         message.dev_status,
         message.dev_last_seen
     )
-    dev_status_new, dev_last_seen_new = wemo_gw.read_status(
+    result = yield from wemo_gw.read_status(
         name=message.dev_name,
         addr=message.dev_addr,
-        last_seen=message.dev_last_seen
+        last_seen=message.dev_last_seen,
+        force=message.force,
+        deadline=deadline
+    )
+    logger.debug(
+        'Status query for [%s] returned [%s] in %.3f seconds (error: %s)',
+        message.dev_name,
+        result.status,
+        result.latency,
+        result.error
     )
 
     # Send response indicating query was executed
@@ -124,8 +134,8 @@ def get_wemo_state(logger, ref_num, wemo_gw, msg, message_types):
         source_port=message.dest_port,
         msg_type=message_types['get_device_state_ack'],
         dev_name=message.dev_name,
-        dev_status=str(dev_status_new),
-        dev_last_seen=str(dev_last_seen_new)[:19]
+        dev_status=str(result.status),
+        dev_last_seen=str(result.timestamp)[:19]
     )
 
     # Load message into output list
@@ -138,7 +148,7 @@ def get_wemo_state(logger, ref_num, wemo_gw, msg, message_types):
 
 # Internal Service Work Subtask - wemo turn on ********************************
 @asyncio.coroutine
-def set_wemo_state(logger, ref_num, wemo_gw, msg, message_types):
+def set_wemo_state(logger, ref_num, wemo_gw, msg, message_types, deadline=None):
     """ Function to set state of wemo device to "on" """
     # Configure loggers
     logger = logger or logging.getLogger(__name__)
@@ -156,10 +166,12 @@ def set_wemo_state(logger, ref_num, wemo_gw, msg, message_types):
             'Commanding wemo device [%s] to "on"',
             message.dev_name
         )
-        dev_status_new, dev_last_seen_new = wemo_gw.turn_on(
+        result = yield from wemo_gw.set_state(
             name=message.dev_name,
             addr=message.dev_addr,
-            last_seen=message.dev_last_seen
+            state='on',
+            last_seen=message.dev_last_seen,
+            deadline=deadline
         )
 
     # Execute wemo off commands
@@ -168,10 +180,12 @@ def set_wemo_state(logger, ref_num, wemo_gw, msg, message_types):
             'Commanding wemo device [%s] to "off"',
             message.dev_name
         )
-        dev_status_new, dev_last_seen_new = wemo_gw.turn_off(
+        result = yield from wemo_gw.set_state(
             name=message.dev_name,
             addr=message.dev_addr,
-            last_seen=message.dev_last_seen
+            state='off',
+            last_seen=message.dev_last_seen,
+            deadline=deadline
         )
 
     # If command not valid, leave device un-changed
@@ -181,8 +195,12 @@ def set_wemo_state(logger, ref_num, wemo_gw, msg, message_types):
             message.dev_cmd,
             message.dev_name
         )
-        dev_status_new = copy.copy(message.dev_status)
-        dev_last_seen_new = copy.copy(message.dev_last_seen)
+        result = WemoResult(
+            copy.copy(message.dev_status),
+            copy.copy(message.dev_last_seen),
+            0.0,
+            'invalid command'
+        )
 
     # Send response indicating command was executed
     logger.debug('Building response message')
@@ -195,8 +213,8 @@ def set_wemo_state(logger, ref_num, wemo_gw, msg, message_types):
         source_port=message.dest_port,
         msg_type=message_types['set_device_state_ack'],
         dev_name=message.dev_name,
-        dev_status=dev_status_new,
-        dev_last_seen=dev_last_seen_new
+        dev_status=result.status,
+        dev_last_seen=result.timestamp
     )
 
     # Load message into output list
@@ -208,3 +226,94 @@ def set_wemo_state(logger, ref_num, wemo_gw, msg, message_types):
 
     # Return response message
     return out_msg_list
+
+
+# Internal Service Work Subtask - expired wemo get status *********************
+def expire_wemo_state(logger, ref_num, wemo_gw, msg, message_types):
+    """ Function to answer a status request that missed its deadline from
+        the last known state, without querying the device """
+    # Configure loggers
+    logger = logger or logging.getLogger(__name__)
+
+    # Initialize result list
+    out_msg_list = []
+
+    # Map message into GDS message class
+    message = GetDeviceStateMessage(logger=logger)
+    message.complete = msg
+
+    # Use last known state if there is one
+    last = wemo_gw.state_cache.last_known(message.dev_name)
+    if last is not None:
+        dev_status = last.status
+        dev_last_seen = last.last_seen
+    else:
+        dev_status = 'expired'
+        dev_last_seen = message.dev_last_seen
+    logger.debug(
+        'Status request for [%s] expired.  Answering with [%s]',
+        message.dev_name,
+        dev_status
+    )
+
+    # Send response without touching the device
+    out_msg = GetDeviceStateMessageACK(
+        logger=logger,
+        ref=ref_num.new(),
+        dest_addr=message.source_addr,
+        dest_port=message.source_port,
+        source_addr=message.dest_addr,
+        source_port=message.dest_port,
+        msg_type=message_types['get_device_state_ack'],
+        dev_name=message.dev_name,
+        dev_status=str(dev_status),
+        dev_last_seen=str(dev_last_seen)[:19]
+    )
+
+    # Load message into output list
+    logger.debug('Loading completed msg: [%s]', out_msg.complete)
+    out_msg_list.append(copy.copy(out_msg.complete))
+
+    # Return response message
+    return out_msg_list
+
+
+# Internal Service Work Subtask - expired wemo set state **********************
+def expire_set_wemo_state(logger, ref_num, msg, message_types):
+    """ Function to acknowledge a command that missed its deadline without
+        sending it to the device """
+    # Configure loggers
+    logger = logger or logging.getLogger(__name__)
+
+    # Initialize result list
+    out_msg_list = []
+
+    # Map message into CCS message class
+    message = SetDeviceStateMessage(logger=logger)
+    message.complete = msg
+    logger.debug(
+        'Command [%s] for [%s] expired.  Not sent to device',
+        message.dev_cmd,
+        message.dev_name
+    )
+
+    # Send response indicating command was not executed
+    out_msg = SetDeviceStateMessageACK(
+        logger=logger,
+        ref=ref_num.new(),
+        dest_addr=message.source_addr,
+        dest_port=message.source_port,
+        source_addr=message.dest_addr,
+        source_port=message.dest_port,
+        msg_type=message_types['set_device_state_ack'],
+        dev_name=message.dev_name,
+        dev_status='expired',
+        dev_last_seen=message.dev_last_seen
+    )
+
+    # Load message into output list
+    logger.debug('Loading completed msg: [%s]', out_msg.complete)
+    out_msg_list.append(copy.copy(out_msg.complete))
+
+    # Return response message
+    return out_msg_list
@@ -0,0 +1,136 @@
+#!/usr/bin/python3
+""" poll_scheduler.py:
+    Adaptive per-device polling intervals
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import logging
+import time
+from bob_wemo_service.device_registry import normalize_name
+
+
+# Authorship Info *************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2017, The B.O.B. Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Poll entry definition *******************************************************
+class PollEntry(object):
+    """ Polling history for a single device """
+    __slots__ = ('name', 'status', 'interval', 'next_poll', 'changes', 'failures')
+
+    def __init__(self, name=None, interval=0.0, next_poll=0.0):
+        self.name = name
+        self.status = None
+        self.interval = interval
+        self.next_poll = next_poll
+        self.changes = 0
+        self.failures = 0
+
+
+# Poll scheduler class definition *********************************************
+class PollScheduler(object):
+    """ Decides when each device is next polled.  A device whose state
+        changed since the last observation has its interval divided by
+        factor, a device whose state held steady has it multiplied by
+        growth, and an unreachable device has it multiplied by factor.
+        Intervals stay between minimum and maximum.
+    """
+    def __init__(self, logger=None, interval=300.0, minimum=30.0,
+                 maximum=1800.0, factor=2.0, growth=1.25, clock=None):
+        # Configure loggers
+        self.logger = logger or logging.getLogger(__name__)
+        # Scheduling parameters
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+        self.interval = min(self.maximum, max(self.minimum, float(interval)))
+        self.factor = float(factor)
+        self.growth = float(growth)
+        self.clock = clock or time.monotonic
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name):
+        return normalize_name(name) in self._entries
+
+    def add(self, name, now=None):
+        """ Adds a device to the schedule, due for polling immediately.
+            Returns its entry
+        """
+        key = normalize_name(name)
+        entry = self._entries.get(key)
+        if entry is None:
+            now = self.clock() if now is None else now
+            entry = PollEntry(name=name, interval=self.interval, next_poll=now)
+            self._entries[key] = entry
+        return entry
+
+    def interval_for(self, name):
+        """ Returns the current polling interval of a device """
+        entry = self._entries.get(normalize_name(name))
+        return self.interval if entry is None else entry.interval
+
+    def record(self, name, status, now=None):
+        """ Records an observed device status and schedules the next poll.
+            Returns the new polling interval of the device
+        """
+        now = self.clock() if now is None else now
+        entry = self.add(name, now=now)
+        if status == 'offline':
+            entry.failures += 1
+            entry.interval = min(self.maximum, entry.interval * self.factor)
+        else:
+            if entry.status is not None and status != entry.status:
+                entry.changes += 1
+                entry.interval = max(self.minimum, entry.interval / self.factor)
+                self.logger.debug(
+                    'Device %s changed state.  Polling every %.0f seconds',
+                    name,
+                    entry.interval
+                )
+            else:
+                entry.interval = min(self.maximum, entry.interval * self.growth)
+            entry.status = status
+            entry.failures = 0
+        entry.next_poll = now + entry.interval
+        return entry.interval
+
+    def poke(self, name, delay=0.0, now=None):
+        """ Brings the next poll of a device forward to at most delay seconds
+            from now, e.g. to confirm the result of a command """
+        now = self.clock() if now is None else now
+        entry = self.add(name, now=now)
+        entry.next_poll = min(entry.next_poll, now + delay)
+
+    def due(self, now=None):
+        """ Returns the names of the devices due for polling.  Each device
+            returned is rescheduled one interval ahead, so a poll that never
+            reports back does not leave it permanently due
+        """
+        now = self.clock() if now is None else now
+        names = []
+        for entry in self._entries.values():
+            if now >= entry.next_poll:
+                entry.next_poll = now + entry.interval
+                names.append(entry.name)
+        return names
+
+    def next_due(self, now=None):
+        """ Returns the number of seconds until the next poll is due, or None
+            if no device is scheduled
+        """
+        if len(self._entries) == 0:
+            return None
+        now = self.clock() if now is None else now
+        return max(
+            0.0,
+            min(entry.next_poll for entry in self._entries.values()) - now
+        )
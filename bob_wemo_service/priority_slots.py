@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+""" priority_slots.py:
+    Device slots granted to waiting work in priority order
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import asyncio
+import collections
+import itertools
+import logging
+
+
+# Authorship Info *************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2017, The B.O.B. Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Work classes, most urgent first
+COMMAND = 0
+QUERY = 1
+BACKGROUND = 2
+CLASS_NAMES = {COMMAND: 'command', QUERY: 'query', BACKGROUND: 'background'}
+
+
+# Priority slots class definition *********************************************
+class PrioritySlots(object):
+    """ Counting semaphore that hands free slots to the most urgent class of
+        waiting work first, and to work of the same class in arrival order.
+        A class may be capped below the total so that some slots are always
+        left for more urgent work.
+    """
+    def __init__(self, value, limits=None, logger=None, loop=None):
+        # Configure loggers
+        self.logger = logger or logging.getLogger(__name__)
+        self.loop = loop or asyncio.get_event_loop()
+        self.value = int(value)
+        self.limits = dict(limits or {})
+        self.held = collections.Counter()
+        self._waiters = []
+        self._order = itertools.count()
+
+    @property
+    def free(self):
+        """ Returns the number of slots not held """
+        return self.value - sum(self.held.values())
+
+    def acquire(self, priority=QUERY):
+        """ Queues a request for a slot.  Returns a future that completes
+            once the slot is granted; the caller must then release it
+        """
+        future = self.loop.create_future()
+        self._waiters.append((priority, next(self._order), future))
+        self._waiters.sort(key=lambda waiter: waiter[:2])
+        self._grant()
+        return future
+
+    def release(self, priority=QUERY):
+        """ Returns a slot and grants it to the next waiter """
+        self.held[priority] -= 1
+        self._grant()
+
+    def cancel(self, future, priority=QUERY):
+        """ Withdraws a request for a slot, releasing the slot if it had
+            already been granted """
+        if future.done() and not future.cancelled():
+            self.release(priority)
+        else:
+            future.cancel()
+            self._grant()
+
+    def waiting(self):
+        """ Returns a dict of the number of waiters by class name """
+        counts = collections.Counter(
+            CLASS_NAMES.get(priority, priority)
+            for priority, order, future in self._waiters
+            if not future.done()
+        )
+        return dict(counts)
+
+    def _grant(self):
+        """ Grants free slots to waiters in priority order, skipping waiters
+            whose class is at its cap """
+        remaining = []
+        for priority, order, future in self._waiters:
+            if future.done():
+                continue
+            if self.free > 0 and self.held[priority] < self.limits.get(priority, self.value):
+                self.held[priority] += 1
+                future.set_result(priority)
+            else:
+                remaining.append((priority, order, future))
+        self._waiters = remaining
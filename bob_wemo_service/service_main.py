@@ -4,13 +4,18 @@
 
 # Import Required Libraries (Standard, Third Party, Local) ********************
 import asyncio
-import copy
+import collections
 import datetime
 import logging
+import time
+from bob_wemo_service.device_registry import normalize_name
 from bob_wemo_service.msg_processing import create_heartbeat_msg
+from bob_wemo_service.msg_processing import expire_set_wemo_state
+from bob_wemo_service.msg_processing import expire_wemo_state
 from bob_wemo_service.msg_processing import process_heartbeat_msg
 from bob_wemo_service.msg_processing import get_wemo_state
 from bob_wemo_service.msg_processing import set_wemo_state
+from bob_wemo_service.priority_slots import BACKGROUND
 
 
 # Authorship Info *************************************************************
@@ -36,22 +41,19 @@ class MainTask(object):
         self.msg_in_queue = None
         self.msg_out_queue = None
         self.service_addresses = []
-        self.message_types = []
+        self.message_types = {}
+        self.handlers = {}
+        self.expired_handlers = {}
+        self.fallback = None
+        self.deadlines = {}
+        self.expired = collections.Counter()
         self.last_check_hb = datetime.datetime.now()
-        self.sleep_time = 0.2
-        self.out_msg = str()
-        self.out_msg_list = []
-        self.next_msg = str()
-        self.next_msg_split = []
-        self.msg_source_addr = str()
-        self.msg_source_port = str()
-        self.msg_type = str()
         self.destinations = []
         self.match = None
-        self.device = None
         self.devices = []
-        self.dev_ptr = 0
-        self.discover_wemo_ts = datetime.datetime.now() - datetime.timedelta(minutes=5)
+        self.sweep_limit = 4
+        self.workers = 8
+        self.sweep_duration = 0.0
         # Map input variables
         if kwargs is not None:
             for key, value in kwargs.items():
@@ -97,122 +99,315 @@ class MainTask(object):
                         'Device list set during __init__ to: %s',
                         self.devices
                     )
+                if key == "deadlines":
+                    self.deadlines = value
+                    self.logger.debug(
+                        'Message deadlines set during __init__ to: %s',
+                        self.deadlines
+                    )
+                if key == "fallback":
+                    self.fallback = value
+                    self.logger.debug(
+                        'Fallback message handler set during __init__ to: %s',
+                        self.fallback
+                    )
+                if key == "workers":
+                    self.workers = max(1, int(value))
+                    self.logger.debug(
+                        'Message worker count set during __init__ to: %s',
+                        self.workers
+                    )
+                if key == "sweep_limit":
+                    self.sweep_limit = int(value)
+                    self.logger.debug(
+                        'Status sweep concurrency limit set during __init__ to: %s',
+                        self.sweep_limit
+                    )
+        # Build message dispatch table
+        self.fallback = self.fallback or self.handle_unknown
+        self.register_handler('heartbeat', self.handle_heartbeat)
+        self.register_handler(
+            'get_device_state',
+            self.handle_get_state,
+            expired=self.handle_get_expired
+        )
+        self.register_handler(
+            'set_device_state',
+            self.handle_set_state,
+            expired=self.handle_set_expired
+        )
+        # Deadlines are configured by message type name
+        deadlines = {}
+        for msg_type, seconds in self.deadlines.items():
+            code = self.type_code(msg_type)
+            if code is not None and float(seconds) > 0:
+                deadlines[code] = float(seconds)
+        self.deadlines = deadlines
+
+
+    def type_code(self, msg_type):
+        """ Returns the integer code of a message type given either as an
+            integer or by its name in the [MESSAGE TYPES] config section,
+            or None if the name is not configured """
+        if isinstance(msg_type, int):
+            return msg_type
+        if msg_type not in self.message_types:
+            self.logger.warning('Message type [%s] not configured', msg_type)
+            return None
+        return int(self.message_types[msg_type])
+
+
+    def register_handler(self, msg_type, handler, expired=None):
+        """ Routes messages of a type to handler, a coroutine taking the raw
+            message and returning the list of response messages.  msg_type
+            is either the integer message type or its name in the
+            [MESSAGE TYPES] config section.  expired, if given, answers
+            messages of the type that missed their deadline instead, and
+            handler is then also passed deadline=, the time.monotonic()
+            value at which the message expires.
+        """
+        code = self.type_code(msg_type)
+        if code is None:
+            self.logger.warning('Handler for [%s] not registered', msg_type)
+            return
+        self.handlers[code] = handler
+        if expired is not None:
+            self.expired_handlers[code] = expired
+        self.logger.debug('Handler for message type %s set to: %s', code, handler)
 
 
     @asyncio.coroutine
-    def check_wemo(self):
-        """ Searches network for devices configured but not previously discovered
+    def poll_device(self, device, limiter):
+        """ Reads the current status of a single device, waiting for a free
+            slot in the sweep concurrency limiter first
         """
-        # Reset the device pointer every 5 minutes to start a new discovery loop
-        if datetime.datetime.now() >= \
-            (self.discover_wemo_ts + datetime.timedelta(minutes=5)) and \
-            self.dev_ptr >= (len(self.devices) - 1):
-            self.dev_ptr = 0
-            self.logger.debug(
-                'Updating status of configured devices in list: %s',
-                self.devices
+        yield from limiter.acquire()
+        try:
+            result = yield from self.gateway.read_status(
+                name=device.dev_name,
+                addr=device.dev_addr,
+                last_seen=device.dev_last_seen,
+                force=True,
+                priority=BACKGROUND
             )
-            self.discover_wemo_ts = datetime.datetime.now()
-        # Check one device per program scan until all are checked
-        if self.dev_ptr < (len(self.devices) - 1):
-            self.dev_ptr += 1
-            self.device = self.devices[self.dev_ptr]
-            # If device is a wemo device, perform status query from device
-            if 'wemo' in self.device.dev_type:
-                self.device.dev_status, self.device.dev_last_seen = self.gateway.read_status(
-                    name=self.device.dev_name,
-                    addr=self.device.dev_addr
-                )
+            device.dev_status = result.status
+            device.dev_last_seen = result.timestamp
+        finally:
+            limiter.release()
 
 
     @asyncio.coroutine
-    def run(self):
-        """ task to handle the work the service is intended to do """
-        self.logger.info('Starting wemo service main task')
-
-        # Main process loop
+    def sweep_wemo(self):
+        """ task to poll configured wemo devices as their adaptive polling
+            intervals come due, running up to sweep_limit queries
+            concurrently.  Commands wake the task early so their result is
+            confirmed shortly after.
+        """
+        self.logger.info('Starting wemo device status sweep task')
+        limiter = asyncio.Semaphore(self.sweep_limit)
+        scheduler = self.gateway.scheduler
+        wemo_devices = dict(
+            (normalize_name(device.dev_name), device) for device in self.devices
+            if 'wemo' in device.dev_type
+        )
+        # Leave the network to start-up discovery until it has finished
+        yield from self.gateway.ready.wait()
         while True:
-            # Initialize result list
-            self.out_msg_list = []
-            self.sleep_time = 0.2
-
-            # INCOMING MESSAGE HANDLING
-            if self.msg_in_queue.qsize() > 0:
-                self.sleep_time = 0.01
-                self.logger.debug('Getting Incoming message from queue')
-                self.next_msg = self.msg_in_queue.get_nowait()
-                self.logger.debug(
-                    'Message pulled from queue: [%s]',
-                    self.next_msg
-                )
-
-                # Determine message type
-                self.next_msg_split = self.next_msg.split(',')
-                if len(self.next_msg_split) >= 6:
-                    self.logger.debug('Extracting source address and message type')
-                    self.msg_source_addr = self.next_msg_split[3]
-                    self.msg_source_port = self.next_msg_split[4]
-                    self.msg_type = self.next_msg_split[5]
-                    self.logger.debug(
-                        'Source Address: %s',
-                        self.msg_source_addr
+            self.gateway.poll_wakeup.clear()
+            # A failed sweep must not stop polling for good
+            retry = 0.0
+            try:
+                due = [
+                    wemo_devices[normalize_name(name)] for name in scheduler.due()
+                    if normalize_name(name) in wemo_devices
+                ]
+                if len(due) > 0:
+                    sweep_start = datetime.datetime.now()
+                    self.logger.debug('Polling status of devices in list: %s', due)
+                    yield from asyncio.gather(
+                        *[self.poll_device(device, limiter) for device in due]
                     )
-                    self.logger.debug(
-                        'Source Port: %s',
-                        self.msg_source_addr
+                    self.sweep_duration = (datetime.datetime.now() - sweep_start).total_seconds()
+                    self.logger.info(
+                        'Status poll of %s wemo devices completed in %.2f seconds',
+                        len(due),
+                        self.sweep_duration
                     )
-                    self.logger.debug(
-                        'Message Type: %s',
-                        self.msg_type
+                    self.logger.info('Wemo gateway metrics: %s', self.gateway.metrics())
+                    self.logger.info(
+                        'Message queue shed counts: in %s, out %s',
+                        dict(self.msg_in_queue.shed),
+                        dict(self.msg_out_queue.shed)
                     )
+                    self.logger.info('Expired messages by type: %s', dict(self.expired))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.logger.exception('Wemo device status sweep failed')
+                # Pause rather than spin on a sweep that keeps failing
+                retry = scheduler.minimum
+            # Wait for the next poll to come due or for a command
+            sleep_time = scheduler.next_due()
+            if sleep_time is None:
+                sleep_time = scheduler.maximum
+            sleep_time = max(sleep_time, retry)
+            try:
+                yield from asyncio.wait_for(
+                    self.gateway.poll_wakeup.wait(),
+                    sleep_time
+                )
+            except asyncio.TimeoutError:
+                pass
 
-                # Process heartbeat from remote service
-                if self.msg_type == self.message_types['heartbeat']:
-                    self.logger.debug('Message is a heartbeat')
-                    self.out_msg_list = process_heartbeat_msg(
-                        self.logger,
-                        self.ref_num,
-                        self.next_msg,
-                        self.message_types
-                    )
 
-                # Wemo Device Status Queries
-                if self.msg_type == self.message_types['get_device_state']:
-                    self.logger.debug('Message is a device status update request')
-                    self.out_msg_list = yield from get_wemo_state(
-                        self.logger,
-                        self.ref_num,
-                        self.gateway,
-                        self.next_msg,
-                        self.message_types
-                    )
+    @asyncio.coroutine
+    def process_msg(self, msg, arrival=None):
+        """ Handles a single inbound message with the handler registered for
+            its type.  A message older than the deadline for its type is
+            given to the expired handler instead, before any device I/O.
+            Returns the list of response messages to send
+        """
+        # Determine message type
+        msg_split = msg.split(',')
+        try:
+            msg_type = int(msg_split[5])
+        except (IndexError, ValueError):
+            msg_type = None
+        handler = self.handlers.get(msg_type, self.fallback)
+
+        # Drop work nobody is waiting for any more
+        deadline = self.deadlines.get(msg_type)
+        if deadline is not None and arrival is not None and \
+                msg_type in self.expired_handlers:
+            age = time.monotonic() - arrival
+            if age > deadline:
+                self.expired[msg_type] += 1
+                self.logger.info(
+                    'Message expired after %.2f seconds in queue: [%s]',
+                    age,
+                    msg
+                )
+                out_msg_list = yield from self.expired_handlers[msg_type](msg)
+                return out_msg_list
+            # The gateway checks again once the device is free
+            out_msg_list = yield from handler(msg, deadline=arrival + deadline)
+            return out_msg_list
+        out_msg_list = yield from handler(msg)
+        return out_msg_list
+
+
+    @asyncio.coroutine
+    def handle_heartbeat(self, msg):
+        """ Process heartbeat from remote service """
+        self.logger.debug('Message is a heartbeat')
+        return process_heartbeat_msg(
+            self.logger,
+            self.ref_num,
+            msg,
+            self.message_types
+        )
+
+
+    @asyncio.coroutine
+    def handle_get_state(self, msg, deadline=None):
+        """ Wemo Device Status Queries """
+        self.logger.debug('Message is a device status update request')
+        out_msg_list = yield from get_wemo_state(
+            self.logger,
+            self.ref_num,
+            self.gateway,
+            msg,
+            self.message_types,
+            deadline=deadline
+        )
+        return out_msg_list
+
+
+    @asyncio.coroutine
+    def handle_set_state(self, msg, deadline=None):
+        """ Wemo Device set state commands """
+        self.logger.debug('Message is a device set state command')
+        out_msg_list = yield from set_wemo_state(
+            self.logger,
+            self.ref_num,
+            self.gateway,
+            msg,
+            self.message_types,
+            deadline=deadline
+        )
+        return out_msg_list
+
+
+    @asyncio.coroutine
+    def handle_get_expired(self, msg):
+        """ Expired wemo device status queries """
+        return expire_wemo_state(
+            self.logger,
+            self.ref_num,
+            self.gateway,
+            msg,
+            self.message_types
+        )
 
-                # Wemo Device set state commands
-                if self.msg_type == self.message_types['set_device_state']:
-                    self.logger.debug('Message is a device set state command')
-                    self.out_msg_list = yield from set_wemo_state(
-                        self.logger,
-                        self.ref_num,
-                        self.gateway,
-                        self.next_msg,
-                        self.message_types
-                    )
 
-                # Que up response messages in outgoing msg que
-                if len(self.out_msg_list) > 0:
-                    self.logger.debug('Queueing outgoing message(s)')
-                    for self.out_msg in self.out_msg_list:
-                        self.msg_out_queue.put_nowait(copy.copy(self.out_msg))
-                        self.logger.debug(
-                            'Message [%s] successfully queued',
-                            self.out_msg
-                        )
+    @asyncio.coroutine
+    def handle_set_expired(self, msg):
+        """ Expired wemo device set state commands """
+        return expire_set_wemo_state(
+            self.logger,
+            self.ref_num,
+            msg,
+            self.message_types
+        )
 
 
-            # WEMO DEVICE DISCOVERY
-            # Search Network for any devices not previously discovered
-            yield from self.check_wemo()
+    @asyncio.coroutine
+    def handle_unknown(self, msg):
+        """ Default fallback for messages of unknown or unregistered type """
+        self.logger.warning('Discarding message of unhandled type: [%s]', msg)
+        return []
 
 
-            # Yield to other tasks for a while
-            yield from asyncio.sleep(self.sleep_time)
+    @asyncio.coroutine
+    def worker(self, worker_id):
+        """ Message worker.  Pulls messages from the inbound queue and sees
+            each one through to its response.  All per-message state is
+            local, so any number of workers can run side by side.  Each
+            worker hands its message to the gateway before it first yields,
+            which keeps messages for the same device in queue order.
+        """
+        self.logger.debug('Starting message worker %s', worker_id)
+        while True:
+            arrival, msg = yield from self.msg_in_queue.get()
+            self.logger.debug(
+                'Worker %s pulled message from queue: [%s]',
+                worker_id,
+                msg
+            )
+            try:
+                out_msg_list = yield from self.process_msg(msg, arrival=arrival)
+            except Exception:
+                self.logger.exception('Failed to process message: [%s]', msg)
+                out_msg_list = []
+
+            # Que up response messages in outgoing msg que, waiting for room
+            # only when the queue is set to block
+            for out_msg in out_msg_list:
+                if self.msg_out_queue.blocking is True:
+                    yield from self.msg_out_queue.put(out_msg)
+                elif self.msg_out_queue.offer(out_msg) is False:
+                    self.logger.warning('Outbound queue full.  Dropped: [%s]', out_msg)
+                    continue
+                self.logger.debug('Message [%s] successfully queued', out_msg)
+
+
+    @asyncio.coroutine
+    def run(self):
+        """ task to handle the work the service is intended to do """
+        self.logger.info(
+            'Starting wemo service main task with %s message workers',
+            self.workers
+        )
+        yield from asyncio.gather(
+            *[self.worker(worker_id) for worker_id in range(self.workers)]
+        )
@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+""" ssdp_listener.py:
+    Passive listener for SSDP multicast announcements from wemo devices
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import asyncio
+import logging
+import socket
+import struct
+from urllib.parse import urlparse
+
+
+# Authorship Info *************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2017, The B.O.B. Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+SSDP_ADDR = '239.255.255.250'
+SSDP_PORT = 1900
+# UDN prefixes of the device types pywemo knows how to build
+WEMO_UDN_PREFIXES = (
+    'uuid:Socket', 'uuid:Lightswitch', 'uuid:Dimmer', 'uuid:Insight',
+    'uuid:Sensor', 'uuid:Maker', 'uuid:Bridge', 'uuid:CoffeeMaker',
+    'uuid:Humidifier'
+)
+
+
+# SSDP packet parser **********************************************************
+def parse_ssdp_packet(data):
+    """ Parses a raw SSDP datagram.  Returns a dict of lower-cased header
+        names to values for NOTIFY packets, or None for anything else
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8', errors='replace')
+    lines = data.replace('\r\n', '\n').split('\n')
+    if len(lines) == 0 or not lines[0].upper().startswith('NOTIFY'):
+        return None
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            headers[key.strip().lower()] = value.strip()
+    return headers
+
+
+def wemo_announcement(headers):
+    """ Extracts (nts, udn, location) from parsed NOTIFY headers if they were
+        sent by a wemo root device, otherwise returns None.  Each device
+        announces every embedded device and service too; only the root
+        device announcement is used.
+    """
+    if headers is None:
+        return None
+    usn = headers.get('usn', str())
+    udn = usn.split('::')[0]
+    if not udn.startswith(WEMO_UDN_PREFIXES):
+        return None
+    if headers.get('nt', str()) != 'upnp:rootdevice':
+        return None
+    nts = headers.get('nts', str()).lower()
+    location = headers.get('location')
+    if nts == 'ssdp:alive' and location:
+        return nts, udn, location
+    if nts == 'ssdp:byebye':
+        return nts, udn, None
+    return None
+
+
+def location_host_port(location):
+    """ Returns the (host, port) tuple of a device description URL """
+    parsed = urlparse(location)
+    return parsed.hostname, parsed.port
+
+
+# Multicast socket helper *****************************************************
+def create_ssdp_socket(interface='0.0.0.0'):
+    """ Creates a UDP socket bound to the SSDP port and joined to the SSDP
+        multicast group """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, 'SO_REUSEPORT'):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        except OSError:
+            pass
+    sock.bind(('', SSDP_PORT))
+    membership = struct.pack(
+        '4s4s',
+        socket.inet_aton(SSDP_ADDR),
+        socket.inet_aton(interface)
+    )
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+    sock.setblocking(False)
+    return sock
+
+
+# Datagram protocol ***********************************************************
+class SsdpListener(asyncio.DatagramProtocol):
+    """ asyncio datagram protocol that hands wemo alive and byebye
+        announcements to callbacks """
+    def __init__(self, on_alive, on_byebye, logger=None):
+        # Configure loggers
+        self.logger = logger or logging.getLogger(__name__)
+        self.on_alive = on_alive
+        self.on_byebye = on_byebye
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.logger.info('Listening for SSDP announcements')
+
+    def datagram_received(self, data, addr):
+        try:
+            announcement = wemo_announcement(parse_ssdp_packet(data))
+        except Exception:
+            self.logger.debug('Ignoring malformed SSDP packet from %s', addr)
+            return
+        if announcement is None:
+            return
+        nts, udn, location = announcement
+        self.logger.debug('SSDP %s from %s: %s %s', nts, addr, udn, location)
+        if nts == 'ssdp:alive':
+            self.on_alive(udn, location)
+        else:
+            self.on_byebye(udn)
+
+    def error_received(self, exc):
+        self.logger.warning('SSDP listener error: %s', exc)
+
+    def connection_lost(self, exc):
+        self.logger.info('SSDP listener closed')
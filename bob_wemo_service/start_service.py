@@ -11,6 +11,7 @@ if __name__ == "__main__":
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from bob_wemo_service.configure import ConfigureService
 from bob_wemo_service.wemo import WemoAPI
+from bob_wemo_service.wemo_gateway import WemoGateway
 from bob_wemo_service.service_main import MainTask
 from bob_wemo_service.ref_num import RefNum
 from bob_wemo_service.message_handlers import MessageHandler
@@ -36,12 +37,37 @@ SERVICE_CONFIG = ConfigureService(CONFIG_FILE)
 LOGGER = SERVICE_CONFIG.get_logger()
 SERVICE_ADDRESSES = SERVICE_CONFIG.get_servers()
 MESSAGE_TYPES = SERVICE_CONFIG.get_message_types()
-WEMO_GW = WemoAPI(LOGGER)
+GATEWAY_SETTINGS = SERVICE_CONFIG.get_gateway_settings()
 DEVICES = SERVICE_CONFIG.get_devices()
 
 REF_NUM = RefNum(logger=LOGGER)
 LOOP = asyncio.get_event_loop()
-COMM_HANDLER = MessageHandler(LOOP, logger=LOGGER)
+WEMO_API = WemoAPI(
+    LOGGER,
+    registry_file=GATEWAY_SETTINGS.get('registry_file'),
+    port_check_timeout=GATEWAY_SETTINGS.get('port_check_timeout', 2),
+    keep_alive=GATEWAY_SETTINGS.get('keep_alive', 'true'),
+    keep_alive_idle=GATEWAY_SETTINGS.get('keep_alive_idle', 30),
+    breaker_threshold=GATEWAY_SETTINGS.get('breaker_threshold', 0.5),
+    breaker_min_calls=GATEWAY_SETTINGS.get('breaker_min_calls', 4),
+    breaker_window=GATEWAY_SETTINGS.get('breaker_window', 10),
+    breaker_cooldown=GATEWAY_SETTINGS.get('breaker_cooldown', 30)
+)
+WEMO_GW = WemoGateway(
+    logger=LOGGER,
+    api=WEMO_API,
+    loop=LOOP,
+    settings=GATEWAY_SETTINGS,
+    devices=DEVICES
+)
+COMM_HANDLER = MessageHandler(
+    LOOP,
+    logger=LOGGER,
+    in_maxsize=GATEWAY_SETTINGS.get('msg_in_maxsize', 0),
+    in_policy=GATEWAY_SETTINGS.get('msg_in_policy', 'reject'),
+    out_maxsize=GATEWAY_SETTINGS.get('msg_out_maxsize', 0),
+    out_policy=GATEWAY_SETTINGS.get('msg_out_policy', 'drop_oldest')
+)
 MAINTASK = MainTask(
     logger=LOGGER,
     ref=REF_NUM,
@@ -50,7 +76,14 @@ MAINTASK = MainTask(
     msg_out_queue=COMM_HANDLER.msg_out_queue,
     service_addresses=SERVICE_ADDRESSES,
     message_types=MESSAGE_TYPES,
-    devices=DEVICES
+    devices=DEVICES,
+    sweep_limit=GATEWAY_SETTINGS.get('sweep_limit', 4),
+    workers=GATEWAY_SETTINGS.get('msg_workers', 8),
+    deadlines=dict(
+        (key[len('deadline_'):], value)
+        for key, value in GATEWAY_SETTINGS.items()
+        if key.startswith('deadline_')
+    )
 )
 
 
@@ -60,7 +93,7 @@ def main():
 
     LOGGER.debug('Starting main()')
 
-    # Create incoming message server
+    # STAGE 1: Bind the listening socket before any device work starts
     try:
         LOGGER.debug(
             'Creating incoming message listening server at %s:%s',
@@ -84,14 +117,32 @@ def main():
         )
         sys.exit()
 
-    # Create main task for this service
+    # STAGE 2: Start serving messages.  Devices not resolved yet are
+    # answered through on-demand discovery or reported offline
     LOGGER.debug('Scheduling main task for execution')
     asyncio.ensure_future(MAINTASK.run())
 
-    # Create outgoing message task
     LOGGER.debug('Scheduling outgoing message task for execution')
     asyncio.ensure_future(COMM_HANDLER.handle_msg_out())
 
+    # STAGE 3: Reconnect saved devices and run network discovery in the
+    # background.  Progress is reported through WEMO_GW.readiness
+    LOGGER.debug('Scheduling wemo device warm start for execution')
+    asyncio.ensure_future(WEMO_GW.warm_start())
+
+    LOGGER.debug('Scheduling passive SSDP listener for execution')
+    asyncio.ensure_future(WEMO_GW.listen_ssdp())
+
+    LOGGER.debug('Scheduling event subscription start-up for execution')
+    asyncio.ensure_future(WEMO_GW.start_subscriptions())
+
+    # STAGE 4: Background device duties, which wait for discovery to finish
+    LOGGER.debug('Scheduling device status sweep task for execution')
+    asyncio.ensure_future(MAINTASK.sweep_wemo())
+
+    LOGGER.debug('Scheduling offline device retry task for execution')
+    asyncio.ensure_future(WEMO_GW.retry_offline())
+
     # Serve requests until Ctrl+C is pressed
     LOGGER.info('Wemo Gateway Service')
     LOGGER.info('Serving on %s', msg_in_task.sockets[0].getsockname())
@@ -113,6 +164,7 @@ def main():
                 LOGGER.info('Waiting for task [%s] to shut down', i)
                 task.cancel()
                 LOOP.run_until_complete(task)
+        WEMO_GW.close()
         LOGGER.info('Shutdown complete.  Terminating execution LOOP')
 
     # Terminate the execution LOOP
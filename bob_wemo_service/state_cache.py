@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+""" state_cache.py:
+    Time-to-live cache of the last known state of each device
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import logging
+import time
+from bob_wemo_service.device_registry import normalize_name
+
+
+# Authorship Info *************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2017, The B.O.B. Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Cache entry definition ******************************************************
+class StateEntry(object):
+    """ Last known state of a single device """
+    __slots__ = ('status', 'last_seen', 'updated', 'stale')
+
+    def __init__(self, status=None, last_seen=None, updated=0.0):
+        self.status = status
+        self.last_seen = last_seen
+        self.updated = updated
+        self.stale = False
+
+    def age(self, now):
+        """ Returns the number of seconds since the entry was written """
+        return now - self.updated
+
+
+# State cache class definition ************************************************
+class StateCache(object):
+    """ Holds the last known state of each device along with when it was
+        recorded.  Freshness is judged against a TTL chosen by device type,
+        falling back to the default TTL for unlisted types.
+    """
+    def __init__(self, logger=None, default_ttl=2.0, ttls=None, clock=None):
+        # Configure loggers
+        self.logger = logger or logging.getLogger(__name__)
+        self.default_ttl = float(default_ttl)
+        self.ttls = {}
+        for dev_type, ttl in (ttls or {}).items():
+            self.ttls[normalize_name(dev_type)] = float(ttl)
+        self.clock = clock or time.monotonic
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def ttl(self, dev_type=None):
+        """ Returns the freshness TTL for a device type """
+        return self.ttls.get(normalize_name(dev_type), self.default_ttl)
+
+    def put(self, name, status, last_seen, now=None):
+        """ Records the current state of a device """
+        now = self.clock() if now is None else now
+        self._entries[normalize_name(name)] = StateEntry(
+            status=status,
+            last_seen=last_seen,
+            updated=now
+        )
+
+    def get(self, name, dev_type=None, now=None, ttl=None):
+        """ Returns the cached entry for a device if it is still fresh,
+            otherwise None.  An explicit ttl overrides the device type TTL.
+        """
+        entry = self._entries.get(normalize_name(name))
+        if entry is None or entry.stale is True:
+            return None
+        now = self.clock() if now is None else now
+        if ttl is None:
+            ttl = self.ttl(dev_type)
+        if entry.age(now) > ttl:
+            return None
+        return entry
+
+    def last_known(self, name):
+        """ Returns the cached entry for a device regardless of its age or
+            whether it was invalidated """
+        return self._entries.get(normalize_name(name))
+
+    def invalidate(self, name):
+        """ Marks any cached state for a device stale so get() no longer
+            serves it.  The entry is kept as the last known state. """
+        entry = self._entries.get(normalize_name(name))
+        if entry is not None:
+            entry.stale = True
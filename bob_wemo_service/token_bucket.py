@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+""" token_bucket.py:
+    Token bucket rate limiting of requests sent to each device
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import collections
+import logging
+import time
+from bob_wemo_service.device_registry import normalize_name
+
+
+# Authorship Info *************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2017, The B.O.B. Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Token bucket definition *****************************************************
+class TokenBucket(object):
+    """ Bucket refilled at rate tokens per second up to burst tokens """
+    __slots__ = ('rate', 'burst', 'tokens', 'stamp')
+
+    def __init__(self, rate, burst, now=0.0):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = self.burst
+        self.stamp = now
+
+    def refill(self, now):
+        """ Adds the tokens earned since the last refill """
+        if now > self.stamp:
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+        return self.tokens
+
+    def reserve(self, now):
+        """ Takes a token even if none is available yet.  Returns the number
+            of seconds until the reserved token is earned """
+        self.refill(now)
+        self.tokens -= 1.0
+        if self.tokens >= 0.0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+# Rate limiter class definition ***********************************************
+class RateLimiter(object):
+    """ Holds a token bucket per device and, optionally, one per device type
+        shared by every device of that type.  A request must find a token in
+        both buckets.  A rate of zero disables the matching bucket.
+    """
+    def __init__(self, logger=None, rate=0.0, burst=1.0, type_limits=None,
+                 clock=None):
+        # Configure loggers
+        self.logger = logger or logging.getLogger(__name__)
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.type_limits = {}
+        for dev_type, (type_rate, type_burst) in (type_limits or {}).items():
+            self.type_limits[normalize_name(dev_type)] = (
+                float(type_rate), max(1.0, float(type_burst))
+            )
+        self.clock = clock or time.monotonic
+        self.counters = collections.Counter()
+        self._devices = {}
+        self._types = {}
+
+    def _buckets(self, name, dev_type, now):
+        """ Returns the buckets that apply to a device """
+        buckets = []
+        if self.rate > 0:
+            key = normalize_name(name)
+            if key not in self._devices:
+                self._devices[key] = TokenBucket(self.rate, self.burst, now=now)
+            buckets.append(self._devices[key])
+        type_key = normalize_name(dev_type)
+        if type_key in self.type_limits and self.type_limits[type_key][0] > 0:
+            if type_key not in self._types:
+                type_rate, type_burst = self.type_limits[type_key]
+                self._types[type_key] = TokenBucket(type_rate, type_burst, now=now)
+            buckets.append(self._types[type_key])
+        return buckets
+
+    def allow(self, name, dev_type=None, now=None):
+        """ Takes a token for a request that can be answered some other way.
+            Returns False, taking nothing, if any bucket is empty
+        """
+        now = self.clock() if now is None else now
+        buckets = self._buckets(name, dev_type, now)
+        if any(bucket.refill(now) < 1.0 for bucket in buckets):
+            self.counters['limited'] += 1
+            self.logger.debug('Request to [%s] rate limited', name)
+            return False
+        for bucket in buckets:
+            bucket.tokens -= 1.0
+        return True
+
+    def reserve(self, name, dev_type=None, now=None):
+        """ Takes a token for a request that must be sent.  Returns the
+            number of seconds the request has to wait for it
+        """
+        now = self.clock() if now is None else now
+        delay = max(
+            [bucket.reserve(now) for bucket in self._buckets(name, dev_type, now)] +
+            [0.0]
+        )
+        if delay > 0:
+            self.counters['delayed'] += 1
+            self.logger.debug(
+                'Request to [%s] rate limited.  Delaying %.2f seconds',
+                name,
+                delay
+            )
+        return delay
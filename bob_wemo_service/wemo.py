@@ -3,10 +3,18 @@
 """
 
 # Import Required Libraries (Standard, Third Party, Local) ********************
-import copy
 import datetime
 import logging
+import threading
+import time
+from urllib.parse import urlparse
 import pywemo
+import requests
+from bob_wemo_service.circuit_breaker import BreakerBoard
+from bob_wemo_service.device_registry import WemoRegistry
+from bob_wemo_service.http_sessions import SessionPool
+from bob_wemo_service.wemo_result import offline
+from bob_wemo_service.wemo_result import WemoResult
 from bob_wemo_service.ipv4_help import check_ipv4
 
 
@@ -21,29 +29,187 @@ __email__ = "csmaue@gmail.com"
 __status__ = "Development"
 
 
+# Device identity helpers *****************************************************
+def device_udn(device):
+    """ Returns the UPnP unique device name reported by a pywemo device """
+    config = getattr(device, '_config', None)
+    return getattr(config, 'UDN', None)
+
+
+def device_port(device):
+    """ Returns the TCP port a pywemo device is serving SOAP requests on """
+    try:
+        return urlparse(device.basicevent.controlURL).port
+    except Exception:
+        return None
+
+
+# Device actions **************************************************************
+def query_state(device):
+    """ Reads the current state of a device """
+    return str(device.get_state(force_update=True))
+
+
+def switch_on(device):
+    """ Turns a device on """
+    device.on()
+    return 'on'
+
+
+def switch_off(device):
+    """ Turns a device off """
+    device.off()
+    return 'off'
+
+
 # pywemo wrapper API **********************************************************
 class WemoAPI(object):
     """ Class and methods necessary to read items from a google calendar  """
-    def __init__(self, logger):
+    def __init__(self, logger, **kwargs):
         # Configure loggers
         self.logger = logger or logging.getLogger(__name__)
         # Configure other class objects
-        self._wemo_known = []
-        self.wemo_device = None
-        self.wemo_port = None
-        self.wemo_url = str()
-        self.result = None
-        self.status = str()
-        self.logger.info('Performing initial scan for wemo devices on network')
-        self._wemo_known = pywemo.discover_devices()
-        for device in self._wemo_known:
-            self.logger.info('Found: %s', device)
+        self.registry = WemoRegistry(logger=self.logger)
+        self.registry_file = None
+        self.port_check_timeout = 2.0
+        self.subscriptions = None
+        self.event_callback = None
+        self._subscribed = {}
+        self._lock = threading.RLock()
+        self.breaker_settings = {}
+        self.keep_alive = True
+        self.keep_alive_idle = 30.0
+        # Map input variables
+        if kwargs is not None:
+            for key, value in kwargs.items():
+                if key == "registry_file":
+                    self.registry_file = value
+                    self.logger.debug(
+                        'Registry file set during __init__ to: %s',
+                        self.registry_file
+                    )
+                if key == "port_check_timeout":
+                    self.port_check_timeout = float(value)
+                    self.logger.debug(
+                        'Port check timeout set during __init__ to: %s',
+                        self.port_check_timeout
+                    )
+                if key == "keep_alive":
+                    self.keep_alive = str(value).strip().lower() in ['1', 'true', 'yes', 'on']
+                    self.logger.debug(
+                        'Keep-alive sessions set during __init__ to: %s',
+                        self.keep_alive
+                    )
+                if key == "keep_alive_idle":
+                    self.keep_alive_idle = float(value)
+                    self.logger.debug(
+                        'Keep-alive idle timeout set during __init__ to: %s',
+                        self.keep_alive_idle
+                    )
+                if key.startswith("breaker_") and value is not None:
+                    self.breaker_settings[key[len('breaker_'):]] = value
+                    self.logger.debug(
+                        'Circuit breaker setting [%s] set during __init__ to: %s',
+                        key,
+                        value
+                    )
+        self.breakers = BreakerBoard(logger=self.logger, **self.breaker_settings)
+        self.sessions = SessionPool(logger=self.logger, max_idle=self.keep_alive_idle)
+        if self.keep_alive is True:
+            self.sessions.install()
 
 
     @property
     def wemo_known(self):
         """ Return complete list of known devices """
-        return self._wemo_known
+        return self.registry.devices
+
+
+    def register(self, device, name=None, addr=None, url=None):
+        """ Adds a discovered device to the registry, or refreshes the entry
+            already held for it """
+        # A rediscovered device gets a fresh connection
+        self.sessions.evict(addr or device.host)
+        port = device_port(device)
+        if url is None and port is not None:
+            url = 'http://%s:%i/setup.xml' % (addr or device.host, port)
+        entry = self.registry.update(
+            device=device,
+            name=name,
+            addr=addr,
+            udn=device_udn(device),
+            port=port,
+            url=url,
+            model=getattr(device, 'model_name', None),
+            mac=getattr(device, 'mac', None)
+        )
+        # Subscribe to events from newly discovered device handles
+        if self.subscriptions is not None and entry is not None:
+            self.subscribe(entry)
+        self.save_registry()
+        return entry
+
+
+    def load_registry(self):
+        """ Loads the devices saved by a previous run.  Returns the number of
+            entries loaded """
+        if not self.registry_file:
+            return 0
+        return self.registry.load(self.registry_file)
+
+
+    def is_resolved(self, name=None, addr=None):
+        """ Returns True if a live device handle is held for a device """
+        entry = self.registry.by_name(name)
+        if entry is None and check_ipv4(addr) is True:
+            entry = self.registry.by_addr(addr)
+        return entry is not None and entry.device is not None
+
+
+    def save_registry(self):
+        """ Writes the device registry to disk if anything has changed """
+        if self.registry_file and self.registry.dirty:
+            try:
+                self.registry.save(self.registry_file)
+            except OSError:
+                self.logger.warning(
+                    'Failed to save device registry to: %s',
+                    self.registry_file
+                )
+
+
+    def connect(self, entry):
+        """ Rebuilds the device handle for a registry entry loaded from disk
+            straight from its saved setup.xml URL.  Returns the device, or
+            None if it did not answer
+        """
+        if entry.device is not None:
+            return entry.device
+        if not entry.url or not entry.udn:
+            return None
+        self.logger.debug('Reconnecting to saved device: %s', entry)
+        try:
+            device = pywemo.discovery.device_from_uuid_and_location(
+                entry.udn,
+                entry.mac,
+                entry.url
+            )
+        except Exception:
+            self.logger.debug('Saved device did not answer: %s', entry)
+            return None
+        if device is not None:
+            self.register(device, addr=entry.addr, url=entry.url)
+        return device
+
+
+    def discover_all(self):
+        """ Runs a full SSDP discovery and registers every device found """
+        self.logger.info('Performing network scan for wemo devices')
+        devices = pywemo.discover_devices()
+        for device in devices:
+            self.logger.info('Found: %s', device)
+            self.register(device)
+        return len(devices)
 
 
     def search_by_name(self, name=None, addr=None):
@@ -56,9 +222,13 @@ class WemoAPI(object):
             name
         )
         # Search table of previously discovered devices
-        for i, device in enumerate(self._wemo_known):
-            if name.lower() == device.name.lower():
-                self.logger.debug('Match found at index: %s', i)
+        entry = self.registry.by_name(name)
+        if entry is None and check_ipv4(addr) is True:
+            entry = self.registry.by_addr(addr)
+        if entry is not None:
+            device = self.connect(entry)
+            if device is not None:
+                self.logger.debug('Match found: %s', entry)
                 return device
         # If not found, run a device-specific discovery
         self.logger.debug(
@@ -66,18 +236,118 @@ class WemoAPI(object):
             name,
             addr
         )
-        self.wemo_device = self.discover(name=name, addr=addr)
-        # If discovered, return device, else return None
-        if self.wemo_device is not None:
-            return self.wemo_device
+        return self.discover(name=name, addr=addr)
+
+
+    def start_subscriptions(self, callback):
+        """ Starts the UPnP event subscription registry and subscribes to
+            every known device.  callback(name, addr, status, last_seen) is
+            called from the pywemo event thread for each BinaryState event.
+            pywemo renews each subscription at three quarters of its timeout.
+        """
+        self.logger.info('Starting wemo event subscription registry')
+        self.event_callback = callback
+        self.subscriptions = pywemo.SubscriptionRegistry()
+        self.subscriptions.start()
+        for entry in self.registry.entries:
+            self.subscribe(entry)
+
+
+    def stop_subscriptions(self):
+        """ Stops the UPnP event subscription registry """
+        if self.subscriptions is not None:
+            self.logger.info('Stopping wemo event subscription registry')
+            self.subscriptions.stop()
+            self.subscriptions = None
+            with self._lock:
+                self._subscribed = {}
+
+
+    def is_subscribed(self, name):
+        """ Returns True if events are being received for a device """
+        entry = self.registry.by_name(name)
+        return entry is not None and entry.device is not None and \
+            self._subscribed.get(entry.key) is entry.device
+
+
+    def subscribe(self, entry):
+        """ Subscribes to BinaryState events from a registry entry's device
+            handle, unless that handle is already subscribed """
+        device = entry.device
+        with self._lock:
+            if device is None or self._subscribed.get(entry.key) is device:
+                return
+            try:
+                self.subscriptions.register(device)
+                self.subscriptions.on(device, 'BinaryState', self._on_event)
+                self._subscribed[entry.key] = device
+                self.logger.debug('Subscribed to events from: %s', entry.name)
+            except Exception:
+                self.logger.warning('Failed to subscribe to events from: %s', entry.name)
+
+
+    def _on_event(self, device, type_, value):
+        """ Handles a BinaryState event delivered by the subscription
+            registry.  The first field is 0 for off, 1 for on and 8 for an
+            Insight switch that is on in standby.
+        """
+        state = str(value).split('|')[0]
+        if state in ['1', '8']:
+            status = '1'
         else:
-            return None
+            status = '0'
+        self.logger.debug(
+            'Event %s=%s received from: %s',
+            type_,
+            value,
+            device.name
+        )
+        if self.event_callback is not None:
+            self.event_callback(
+                device.name,
+                device.host,
+                status,
+                str(datetime.datetime.now())
+            )
+
+
+    def check_port(self, addr, port):
+        """ Returns True if a wemo device answers at an address and port
+            within the short port check timeout """
+        try:
+            response = requests.get(
+                'http://%s:%i/setup.xml' % (addr, port),
+                timeout=self.port_check_timeout
+            )
+        except requests.exceptions.RequestException:
+            return False
+        return ('WeMo' in response.text) or ('Belkin' in response.text)
+
+
+    def probe_port(self, addr):
+        """ Finds the port a wemo device is listening on.  The last port the
+            address answered on is tried first, and the full pywemo probe of
+            every candidate port only runs if that fails.
+        """
+        port = self.registry.port_for(addr)
+        if port is not None:
+            if self.check_port(addr, port) is True:
+                self.logger.debug('Device @ %s still answering on port %s', addr, port)
+                return port
+            self.logger.debug('Device @ %s no longer answering on port %s', addr, port)
+        port = pywemo.ouimeaux_device.probe_wemo(addr)
+        if port is not None:
+            self.registry.remember_port(addr, port)
+        else:
+            self.registry.forget_port(addr)
+        self.save_registry()
+        return port
 
 
     def discover(self, name=None, addr=None):
         """ discovers wemo device on network based upon known IP address """
-        self.wemo_device = None
-        self.wemo_port = None
+        device = None
+        port = None
         # Check if valid address was given
         if check_ipv4(addr) is True:
             self.logger.info(
@@ -86,33 +356,78 @@ class WemoAPI(object):
                 addr
             )
             try:
-                self.wemo_port = pywemo.ouimeaux_device.probe_wemo(addr)
-                self.logger.debug('Device discovered at port %s', self.wemo_port)
+                port = self.probe_port(addr)
+                self.logger.debug('Device discovered at port %s', port)
             except Exception:
-                self.wemo_port = None
+                port = None
                 self.logger.warning('Failed to discover port for: %s', name)
         else:
-            self.wemo_port = None
             self.logger.debug('Invalid IP address in device attributes')
         # If port was found, create url for device and run discovery function
-        if self.wemo_port is not None:
-            self.wemo_url = 'http://%s:%i/setup.xml' % (addr, self.wemo_port)
-            self.logger.debug('Resulting URL: %s', self.wemo_url)
-            try:
-                self.wemo_device = pywemo.discovery.device_from_description(
-                    self.wemo_url,
-                    None)
-                self.logger.debug('Discovery successful for: %s', name)
-                # Add newly discovered device to list of known devices
-                self._wemo_known.append(copy.copy(self.wemo_device))
-            except Exception:
-                self.logger.warning('Discovery failed for: %s', name)
-                self.wemo_device = None
+        if port is not None:
+            device = self.connect_at(name=name, addr=addr, port=port)
         else:
             self.logger.warning('Discovery failed for: %s', name)
-            self.wemo_device = None
         # Return device to calling program
-        return self.wemo_device
+        return device
+
+
+    def connect_at(self, name=None, addr=None, port=None):
+        """ Builds the handle for a wemo device known to be listening at an
+            address and port, and adds it to the registry """
+        url = 'http://%s:%i/setup.xml' % (addr, port)
+        self.logger.debug('Resulting URL: %s', url)
+        try:
+            device = pywemo.discovery.device_from_description(url, None)
+        except Exception:
+            self.logger.warning('Discovery failed for: %s', name)
+            return None
+        if device is not None:
+            self.logger.debug('Discovery successful for: %s', name)
+            # Add device to registry, or refresh its existing entry
+            self.register(device, addr=addr, url=url)
+        return device
+
+
+    def connect_location(self, udn, location):
+        """ Builds the handle for a device announced over SSDP and adds it to
+            the registry, replacing any previous address for its UDN """
+        try:
+            device = pywemo.discovery.device_from_uuid_and_location(
+                udn,
+                None,
+                location
+            )
+        except Exception:
+            self.logger.warning('Failed to connect to announced device: %s', location)
+            return None
+        if device is not None:
+            self.logger.info('Announced device found: %s', device)
+            self.register(device, url=location)
+        return device
+
+
+    def forget(self, udn):
+        """ Drops the live handle for a device that announced it is leaving
+            the network.  Returns its registry entry, or None """
+        entry = self.registry.detach(udn)
+        if entry is not None:
+            with self._lock:
+                self._subscribed.pop(entry.key, None)
+            self.sessions.evict(entry.addr)
+        return entry
+
+
+    def candidate_ports(self, addr):
+        """ Returns the ports to try for a device, starting with the port it
+            last answered on """
+        ports = list(pywemo.ouimeaux_device.PROBE_PORTS)
+        port = self.registry.port_for(addr)
+        if port is not None:
+            if port in ports:
+                ports.remove(port)
+            ports.insert(0, port)
+        return ports
 
 
     def read_status(self, name=None, addr=None, last_seen=None):
@@ -123,28 +438,7 @@ class WemoAPI(object):
             name,
             addr
         )
-        # Look up physical device
-        self.wemo_device = self.search_by_name(name=name, addr=addr)
-
-        # Perform status query
-        if self.wemo_device is not None:
-            self.status = str(self.wemo_device.get_state(force_update=True))
-            self.logger.debug(
-                'Wemo device %s found with status: %s',
-                name,
-                self.status
-            )
-            # Update last seen timestamp
-            last_seen = str(datetime.datetime.now())
-        else:
-            self.status = 'offline'
-            self.logger.debug(
-                'Wemo device %s discovery failed. Status set to: %s',
-                name,
-                self.status
-            )
-        # Return device status and timestamp
-        return self.status, last_seen
+        return self._device_call(name, addr, last_seen, query_state)
 
 
     # Wemo set to on function *****************************************************
@@ -155,28 +449,7 @@ class WemoAPI(object):
             name,
             addr
         )
-        # Look up physical device
-        self.wemo_device = self.search_by_name(name=name, addr=addr)
-
-        # Perform command
-        if self.wemo_device is not None:
-            self.wemo_device.on()
-            self.status = 'on'
-            self.logger.debug(
-                '"on" command sent to wemo device: %s',
-                self.wemo_device.name
-            )
-            # Update last seen timestamp
-            last_seen = str(datetime.datetime.now())
-        else:
-            self.status = 'offline'
-            self.logger.debug(
-                'Wemo device [%s] discovery failed.  Status set to: %s',
-                name,
-                self.status
-            )
-        # Return device status and timestamp
-        return self.status, last_seen
+        return self._device_call(name, addr, last_seen, switch_on)
 
 
     # Wemo set to off function ****************************************************
@@ -187,25 +460,44 @@ class WemoAPI(object):
             name,
             addr
         )
-        # Look up physical device
-        self.wemo_device = self.search_by_name(name=name, addr=addr)
-
-        # Perform command
-        if self.wemo_device is not None:
-            self.wemo_device.off()
-            self.status = 'off'
-            self.logger.debug(
-                '"off" command sent to wemo device [%s]',
-                self.wemo_device.name
-            )
-            # Update last seen timestamp
-            last_seen = str(datetime.datetime.now())
-        else:
-            self.status = 'offline'
-            self.logger.debug(
-                'Wemo device [%s] discovery failed. Status set to [%s]',
-                name,
-                self.status
-            )
+        return self._device_call(name, addr, last_seen, switch_off)
+
+
+    def _device_call(self, name, addr, last_seen, action):
+        """ Looks up a device and performs an action against it.  Nothing is
+            stored on the instance, so calls for any number of devices may
+            run at once.  Returns a WemoResult
+        """
+        start = time.monotonic()
+        # Fail fast while the device keeps failing calls
+        if self.breakers.allow(name) is False:
+            self.logger.debug('Circuit breaker open for [%s].  Reporting offline', name)
+            return offline(last_seen, error='circuit open')
+
+        # Look up physical device and perform action.  Every call the
+        # breaker allowed must end in a success or failure, or a half-open
+        # probe would never finish
+        try:
+            device = self.search_by_name(name=name, addr=addr)
+            if device is None:
+                self.breakers.record_failure(name)
+                self.logger.debug(
+                    'Wemo device [%s] discovery failed.  Status set to offline',
+                    name
+                )
+                return offline(last_seen, time.monotonic() - start, 'not found')
+            status = action(device)
+        except Exception as exc:
+            self.breakers.record_failure(name)
+            self.logger.warning('Call to wemo device [%s] failed: %r', name, exc)
+            return offline(last_seen, time.monotonic() - start, repr(exc))
+        self.breakers.record_success(name)
+        latency = time.monotonic() - start
+        self.logger.debug(
+            'Wemo device [%s] answered with status [%s] in %.3f seconds',
+            name,
+            status,
+            latency
+        )
         # Return device status and timestamp
-        return self.status, last_seen
+        return WemoResult(status, str(datetime.datetime.now()), latency, None)
@@ -0,0 +1,1149 @@
+#!/usr/bin/python3
+""" wemo_gateway.py:
+    Asyncio front-end for the blocking pywemo wrapper API
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import logging
+import time
+from bob_wemo_service.ipv4_help import check_ipv4
+from bob_wemo_service.backoff import DiscoveryBackoff
+from bob_wemo_service.device_registry import normalize_name
+from bob_wemo_service.poll_scheduler import PollScheduler
+from bob_wemo_service.priority_slots import BACKGROUND
+from bob_wemo_service.priority_slots import COMMAND
+from bob_wemo_service.priority_slots import PrioritySlots
+from bob_wemo_service.priority_slots import QUERY
+from bob_wemo_service.ssdp_listener import SsdpListener
+from bob_wemo_service.ssdp_listener import create_ssdp_socket
+from bob_wemo_service.ssdp_listener import location_host_port
+from bob_wemo_service.state_cache import StateCache
+from bob_wemo_service.token_bucket import RateLimiter
+from bob_wemo_service.wemo_result import offline
+from bob_wemo_service.wemo_result import WemoResult
+
+
+# Authorship Info *************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2017, The B.O.B. Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# State read back from a device after each command
+COMMAND_STATUS = {'on': '1', 'off': '0'}
+
+
+class DeadlineExpired(Exception):
+    """ Raised instead of calling a device once the request has expired """
+
+
+# Async wemo gateway **********************************************************
+class WemoGateway(object):
+    """ Runs every call into the blocking WemoAPI in a bounded thread pool so
+        a slow or offline device never stalls the asyncio event loop
+    """
+    def __init__(self, logger=None, **kwargs):
+        # Configure loggers
+        self.logger = logger or logging.getLogger(__name__)
+        # Define instance variables
+        self.api = None
+        self.loop = None
+        self.settings = {}
+        self.devices = []
+        self.device_types = {}
+        self._inflight = {}
+        self._lanes = {}
+        self._running = set()
+        self._commands = collections.Counter()
+        self._queued_polls = set()
+        self._read_expiry = {}
+        self.expired = collections.Counter()
+        self._coalescing = {}
+        self._resolving = {}
+        self._announced = {}
+        self.ssdp_transport = None
+        self.readiness = 'starting'
+        # Map input variables
+        if kwargs is not None:
+            for key, value in kwargs.items():
+                if key == "api":
+                    self.api = value
+                    self.logger.debug(
+                        'Wemo API set during __init__ to: %s',
+                        self.api
+                    )
+                if key == "loop":
+                    self.loop = value
+                    self.logger.debug(
+                        'Event loop set during __init__ to: %s',
+                        self.loop
+                    )
+                if key == "settings":
+                    self.settings = value
+                    self.logger.debug(
+                        'Gateway settings set during __init__ to: %s',
+                        self.settings
+                    )
+                if key == "devices":
+                    self.devices = value
+                    for device in value:
+                        self.device_types[normalize_name(device.dev_name)] = device.dev_type
+                    self.logger.debug(
+                        'Device type map set during __init__ to: %s',
+                        self.device_types
+                    )
+        self.loop = self.loop or asyncio.get_event_loop()
+        self.ready = asyncio.Event()
+        self.max_workers = int(self.settings.get('max_workers', 4))
+        self.call_timeout = float(self.settings.get('call_timeout', 15))
+        self.lane_limit = int(self.settings.get('lane_limit', self.max_workers))
+        # Background work never holds every slot, so commands and queries
+        # always find one free
+        self.slots = PrioritySlots(
+            self.lane_limit,
+            limits={
+                BACKGROUND: int(self.settings.get(
+                    'background_limit', max(1, self.lane_limit - 1)
+                ))
+            },
+            logger=self.logger,
+            loop=self.loop
+        )
+        self.coalesce_window = float(self.settings.get('coalesce_window', 0))
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers
+        )
+        self.backoff = DiscoveryBackoff(
+            logger=self.logger,
+            initial=self.settings.get('backoff_initial', 5),
+            maximum=self.settings.get('backoff_max', 300),
+            jitter=self.settings.get('backoff_jitter', 0.2)
+        )
+        self.state_cache = StateCache(
+            logger=self.logger,
+            default_ttl=self.settings.get('state_ttl', 2),
+            ttls=dict(
+                (key[len('state_ttl_'):], value)
+                for key, value in self.settings.items()
+                if key.startswith('state_ttl_')
+            )
+        )
+        self.limiter = RateLimiter(
+            logger=self.logger,
+            rate=self.settings.get('rate_limit', 0),
+            burst=self.settings.get('rate_burst', 1),
+            type_limits=dict(
+                (
+                    key[len('rate_limit_'):],
+                    (value, self.settings.get('rate_burst_' + key[len('rate_limit_'):], 1))
+                )
+                for key, value in self.settings.items()
+                if key.startswith('rate_limit_')
+            )
+        )
+        self.subscriptions = str(
+            self.settings.get('subscriptions', 'false')
+        ).strip().lower() in ['1', 'true', 'yes', 'on']
+        self.subscribed_ttl = float(self.settings.get('subscribed_ttl', 300))
+        self.discovery_timeout = float(self.settings.get('discovery_timeout', 60))
+        self.resolve_limit = int(self.settings.get('resolve_limit', 16))
+        self.resolve_timeout = float(self.settings.get('resolve_timeout', 3))
+        self.ssdp_listener = str(
+            self.settings.get('ssdp_listener', 'false')
+        ).strip().lower() in ['1', 'true', 'yes', 'on']
+        # Devices pushing events need far less polling
+        self.scheduler = PollScheduler(
+            logger=self.logger,
+            interval=(
+                self.settings.get('poll_interval_subscribed', 1800)
+                if self.subscriptions is True
+                else self.settings.get('poll_interval', 300)
+            ),
+            minimum=self.settings.get('poll_min', 30),
+            maximum=self.settings.get('poll_max', 3600)
+        )
+        for device in self.devices:
+            if 'wemo' in device.dev_type:
+                self.scheduler.add(device.dev_name)
+        self.poll_after_command = float(self.settings.get('poll_after_command', 5))
+        self.poll_wakeup = asyncio.Event()
+        self.logger.debug(
+            'Gateway thread pool created with %s workers and a %s second '
+            'call timeout',
+            self.max_workers,
+            self.call_timeout
+        )
+
+
+    @asyncio.coroutine
+    def _call(self, func, *args, **kwargs):
+        """ Runs a blocking WemoAPI method in the thread pool and waits at
+            most call_timeout seconds, once it starts, for its result.  A
+            call that times out keeps its worker thread until pywemo gives
+            up on the device.
+        """
+        result = yield from self._call_with_timeout(
+            self.call_timeout, func, *args, **kwargs
+        )
+        return result
+
+
+    @asyncio.coroutine
+    def _call_with_timeout(self, timeout, func, *args, **kwargs):
+        """ Runs a blocking WemoAPI method in the thread pool and waits at
+            most timeout seconds for its result """
+        job, started = self._submit(None, func, *args, **kwargs)
+        result = yield from self._wait_call(job, started, timeout)
+        return result
+
+
+    def _submit(self, on_done, func, *args, **kwargs):
+        """ Hands a blocking WemoAPI method to the thread pool.  on_done, if
+            given, is called on the event loop once the worker thread is
+            finished with the call, however long the caller waited for it.
+            Returns the concurrent future of the call and a future that
+            completes when a worker thread picks the call up.
+        """
+        started = self.loop.create_future()
+
+        def run():
+            self._thread_done(functools.partial(self._set_started, started))
+            return func(*args, **kwargs)
+
+        job = self.executor.submit(run)
+        if on_done is not None:
+            job.add_done_callback(functools.partial(self._thread_done, on_done))
+        return job, started
+
+
+    def _set_started(self, started, job=None):
+        """ Marks a thread pool call as picked up by a worker thread """
+        if not started.done():
+            started.set_result(None)
+
+
+    def _thread_done(self, on_done, job=None):
+        """ Passes a callback from a worker thread to the event loop """
+        try:
+            self.loop.call_soon_threadsafe(on_done)
+        except RuntimeError:
+            # Event loop already closed during shutdown
+            pass
+
+
+    @asyncio.coroutine
+    def _wait_call(self, job, started, timeout):
+        """ Waits at most timeout seconds for a thread pool call.  The
+            timeout runs from when a worker thread picks the call up, so
+            time spent queued behind other calls never counts against it.
+        """
+        future = asyncio.wrap_future(job, loop=self.loop)
+        try:
+            yield from asyncio.wait(
+                [started, future],
+                return_when=asyncio.FIRST_COMPLETED
+            )
+        except asyncio.CancelledError:
+            # Withdraws the call if no worker thread has picked it up yet
+            future.cancel()
+            raise
+        result = yield from asyncio.wait_for(future, timeout)
+        return result
+
+
+    def _admit(self, name):
+        """ Places an operation at the back of the FIFO lane for a device.
+            Admission never yields, so operations reach a device in the order
+            their callers reached the gateway.  Returns the lane ticket.
+        """
+        key = normalize_name(name)
+        previous = self._lanes.get(key)
+        done = self.loop.create_future()
+        self._lanes[key] = done
+        return key, previous, done
+
+
+    def _release(self, ticket, task=None):
+        """ Hands the lane for a device on to the next operation """
+        key, previous, done = ticket
+        if not done.done():
+            done.set_result(None)
+        if self._lanes.get(key) is done:
+            del self._lanes[key]
+
+
+    def _release_idle(self, ticket, task=None):
+        """ Releases a lane ticket whose call never reached the thread
+            pool, e.g. because its task was cancelled before it ran.  A
+            ticket with a call still running is released when the call ends.
+        """
+        if ticket[2] not in self._running:
+            self._release(ticket)
+
+
+    @asyncio.coroutine
+    def _in_lane(self, ticket, priority, func, *args, slot_held=False,
+                 expires=None, **kwargs):
+        """ Waits for the turn of a lane ticket and then for a free global
+            device slot before running a blocking WemoAPI method.  Each
+            device sees one call at a time while different devices run
+            concurrently up to lane_limit.  slot_held is set by callers
+            that were granted their slot before joining the lane.  expires
+            holds the deadline of the request, see _run_held.
+        """
+        key, previous, done = ticket
+        try:
+            if previous is not None and not previous.done():
+                yield from asyncio.wait([previous])
+        except asyncio.CancelledError:
+            self._release(ticket)
+            if slot_held is True:
+                self.slots.release(priority)
+            raise
+        if slot_held is True:
+            result = yield from self._run_held(
+                ticket, priority, func, *args, expires=expires, **kwargs
+            )
+        else:
+            result = yield from self._held_call(
+                ticket, priority, func, *args, expires=expires, **kwargs
+            )
+        return result
+
+
+    @asyncio.coroutine
+    def _in_slot(self, priority, func, *args, **kwargs):
+        """ Runs a blocking WemoAPI method once a global device slot is
+            granted.  Free slots go to commands first, then explicit
+            queries, then background polling and discovery.
+        """
+        result = yield from self._held_call(None, priority, func, *args, **kwargs)
+        return result
+
+
+    @asyncio.coroutine
+    def _held_call(self, ticket, priority, func, *args, expires=None, **kwargs):
+        """ Runs a blocking WemoAPI method in a global device slot.  The
+            slot, and the lane ticket if one is given, stay held until the
+            worker thread is finished with the call.  A caller that times
+            out gets its answer early, but the device never sees a second
+            call overlapping the hung one.
+        """
+        yield from self._take_slot(priority, ticket)
+        result = yield from self._run_held(
+            ticket, priority, func, *args, expires=expires, **kwargs
+        )
+        return result
+
+
+    @asyncio.coroutine
+    def _take_slot(self, priority, ticket=None):
+        """ Waits for a global device slot.  A caller cancelled while
+            waiting also gives up its lane ticket, if it holds one """
+        granted = self.slots.acquire(priority)
+        try:
+            yield from granted
+        except asyncio.CancelledError:
+            self.slots.cancel(granted, priority)
+            if ticket is not None:
+                self._release(ticket)
+            raise
+
+
+    @asyncio.coroutine
+    def _run_held(self, ticket, priority, func, *args, expires=None, **kwargs):
+        """ Runs a blocking WemoAPI method in a slot already granted.
+            expires is a dict whose 'at' entry is the time.monotonic()
+            deadline of the request, or None.  A request that expired while
+            waiting for its lane or slot raises DeadlineExpired instead of
+            reaching the device.
+        """
+        if expires is not None and expires.get('at') is not None and \
+                time.monotonic() > expires['at']:
+            self._held_done(ticket, priority)
+            raise DeadlineExpired()
+        on_done = functools.partial(self._held_done, ticket, priority)
+        try:
+            job, started = self._submit(on_done, func, *args, **kwargs)
+        except Exception:
+            on_done()
+            raise
+        if ticket is not None:
+            self._running.add(ticket[2])
+        result = yield from self._wait_call(job, started, self.call_timeout)
+        return result
+
+
+    def _held_done(self, ticket, priority):
+        """ Returns the slot and lane ticket of a finished call """
+        self.slots.release(priority)
+        if ticket is not None:
+            self._running.discard(ticket[2])
+            self._release(ticket)
+
+
+    def _backing_off(self, name):
+        """ Returns True if a device recently failed discovery and should be
+            reported offline without touching the network """
+        if self.backoff.is_blocked(name):
+            self.logger.debug(
+                'Device [%s] is inside its discovery backoff window.  '
+                'Reporting offline',
+                name
+            )
+            return True
+        return False
+
+
+    def _track_result(self, name, addr, result, generation=None):
+        """ Updates the discovery backoff and state cache with the outcome of
+            a device call.  Only a device that could not be found backs off;
+            timeouts and SOAP errors are left to its circuit breaker.  A read
+            passes the command generation of the device it was admitted at,
+            and is not cached if a command has been admitted since.
+        """
+        if result.ok is False:
+            if result.error == 'not found':
+                self.backoff.record_failure(name, addr=addr)
+            self.state_cache.invalidate(name)
+        else:
+            self.backoff.record_success(name)
+            if generation is not None and \
+                    generation != self._commands[normalize_name(name)]:
+                self.logger.debug(
+                    'Status of [%s] was read before a later command.  Not cached',
+                    name
+                )
+                return
+            # Cache commands in the form a state query reports
+            self.state_cache.put(
+                name,
+                COMMAND_STATUS.get(result.status, result.status),
+                result.timestamp
+            )
+
+
+    @asyncio.coroutine
+    def discover(self, name=None, addr=None, priority=BACKGROUND):
+        """ Discovers a wemo device based upon its IP address.  Returns the
+            device, or None if it could not be found in time
+        """
+        try:
+            device = yield from self._in_slot(
+                priority,
+                self.api.discover,
+                name=name,
+                addr=addr
+            )
+        except asyncio.TimeoutError:
+            self.logger.warning(
+                'Discovery of [%s] @ [%s] timed out after %s seconds',
+                name,
+                addr,
+                self.call_timeout
+            )
+            device = None
+        except Exception:
+            self.logger.exception('Discovery of [%s] @ [%s] failed', name, addr)
+            device = None
+        return device
+
+
+    @asyncio.coroutine
+    def read_status(self, name=None, addr=None, last_seen=None, force=False,
+                    priority=QUERY, deadline=None):
+        """ Queries a device for its current status.  A state read within the
+            TTL for the device type is served from the state cache unless
+            force is set.  Concurrent reads of the same device share a single
+            query.  Background polls pass priority=BACKGROUND so they give
+            way to requests.  A read still waiting for the device at its
+            deadline, a time.monotonic() value, is answered with the last
+            known state instead.  Returns a WemoResult
+        """
+        if force is not True:
+            # State pushed by event subscriptions stays fresh for longer
+            ttl = None
+            if self.subscriptions is True and self.api.is_subscribed(name):
+                ttl = self.subscribed_ttl
+            cached = self.state_cache.get(
+                name,
+                dev_type=self.device_types.get(normalize_name(name)),
+                ttl=ttl
+            )
+            if cached is not None:
+                self.logger.debug(
+                    'Serving cached status [%s] for [%s]',
+                    cached.status,
+                    name
+                )
+                return WemoResult(cached.status, cached.last_seen, 0.0, None)
+        if self._backing_off(name):
+            return offline(last_seen, error='backing off')
+        if self._starting_up(name, addr):
+            return offline(last_seen, error='starting up')
+        # Join a read of the same device that is already in flight, unless
+        # it is a poll still waiting for a background slot
+        key = normalize_name(name)
+        task = self._inflight.get(key)
+        if task is not None and key in self._queued_polls and priority != BACKGROUND:
+            task = None
+        if task is None:
+            # Excess reads are answered with the last known state
+            if not self.limiter.allow(name, dev_type=self.device_types.get(key)):
+                last = self.state_cache.last_known(name)
+                if last is not None:
+                    return WemoResult(last.status, last.last_seen, 0.0, 'rate limited')
+                return offline(last_seen, error='rate limited')
+            expires = {'at': deadline}
+            if priority == BACKGROUND:
+                # Polls join the lane once they hold a slot, so a command
+                # never waits behind a poll that cannot start yet
+                task = asyncio.ensure_future(
+                    self._poll_live(name=name, addr=addr, last_seen=last_seen),
+                    loop=self.loop
+                )
+            else:
+                ticket = self._admit(name)
+                task = asyncio.ensure_future(
+                    self._read_live(
+                        name=name,
+                        addr=addr,
+                        last_seen=last_seen,
+                        ticket=ticket,
+                        priority=priority,
+                        generation=self._commands[key],
+                        expires=expires
+                    ),
+                    loop=self.loop
+                )
+                # Never leave the lane blocked by a task cancelled before it ran
+                task.add_done_callback(functools.partial(self._release_idle, ticket))
+            self._inflight[key] = task
+            self._read_expiry[key] = expires
+            task.add_done_callback(
+                functools.partial(self._task_done, self._inflight, key)
+            )
+        else:
+            self.logger.debug(
+                'Joining status query already in flight for [%s]',
+                name
+            )
+            # A shared read expires only once every reader has expired
+            self._extend(self._read_expiry.get(key), deadline)
+        result = yield from asyncio.shield(task)
+        if result.ok is False:
+            return result.seen_at(last_seen)
+        return result
+
+
+    def _extend(self, expires, deadline):
+        """ Moves the deadline of a shared request out to that of a newly
+            joined caller.  A caller without a deadline removes it. """
+        if expires is None or expires['at'] is None:
+            return
+        if deadline is None:
+            expires['at'] = None
+        else:
+            expires['at'] = max(expires['at'], deadline)
+
+
+    def _expired_result(self, name, last_seen):
+        """ Returns the answer to a request that expired before reaching
+            the device: the last known state, or 'expired' if none """
+        last = self.state_cache.last_known(name)
+        if last is not None:
+            return WemoResult(last.status, last.last_seen, 0.0, 'expired')
+        return WemoResult('expired', last_seen, 0.0, 'expired')
+
+
+    def _task_done(self, tasks, key, task):
+        """ Releases the slot held by a per-device task once it completes """
+        if tasks.get(key) is task:
+            del tasks[key]
+
+
+    @asyncio.coroutine
+    def _poll_live(self, name=None, addr=None, last_seen=None):
+        """ Performs a background status query.  The background slot is
+            taken first and the device lane joined after, so queued polls
+            never hold up commands to the same device.
+        """
+        key = normalize_name(name)
+        self._queued_polls.add(key)
+        try:
+            yield from self._take_slot(BACKGROUND)
+        finally:
+            self._queued_polls.discard(key)
+        ticket = self._admit(name)
+        result = yield from self._read_live(
+            name=name,
+            addr=addr,
+            last_seen=last_seen,
+            ticket=ticket,
+            priority=BACKGROUND,
+            generation=self._commands[key],
+            slot_held=True
+        )
+        return result
+
+
+    @asyncio.coroutine
+    def _read_live(self, name=None, addr=None, last_seen=None, ticket=None,
+                   priority=QUERY, generation=None, slot_held=False,
+                   expires=None):
+        """ Performs a status query against the physical device once its
+            lane ticket comes up.  generation is the command generation of
+            the device when the read was admitted.  slot_held is set when
+            the caller has already been granted a slot.
+        """
+        try:
+            result = yield from self._in_lane(
+                ticket,
+                priority,
+                self.api.read_status,
+                name=name,
+                addr=addr,
+                last_seen=last_seen,
+                slot_held=slot_held,
+                expires=expires
+            )
+        except DeadlineExpired:
+            self.expired['read'] += 1
+            self.logger.info('Status query for [%s] expired before it was sent', name)
+            return self._expired_result(name, last_seen)
+        except asyncio.TimeoutError:
+            self.logger.warning(
+                'Status query for [%s] @ [%s] timed out after %s seconds',
+                name,
+                addr,
+                self.call_timeout
+            )
+            result = offline(last_seen, self.call_timeout, 'timed out')
+        except Exception as exc:
+            self.logger.exception(
+                'Status query for [%s] @ [%s] failed',
+                name,
+                addr
+            )
+            result = offline(last_seen, error=repr(exc))
+        self._track_result(name, addr, result, generation=generation)
+        if name in self.scheduler:
+            self.scheduler.record(name, result.status)
+        return result
+
+
+    @asyncio.coroutine
+    def set_state(self, name=None, addr=None, state=None, last_seen=None,
+                  deadline=None):
+        """ Commands a device to the requested state ("on" or "off").
+            Commands are never dropped during start-up; an unresolved device
+            goes through on-demand discovery instead.  With a coalescing
+            window configured, commands to the same device arriving within
+            the window collapse into the last requested state.  A command
+            still waiting for the device at its deadline, a time.monotonic()
+            value, is not sent and reports status 'expired'.  Returns a
+            WemoResult
+        """
+        if state not in ['on', 'off']:
+            self.logger.warning(
+                'Invalid state [%s] requested for device [%s]',
+                state,
+                name
+            )
+            return offline(last_seen, error='invalid state')
+        if self._backing_off(name):
+            return offline(last_seen, error='backing off')
+        if self.coalesce_window > 0:
+            result = yield from self._coalesce(
+                name=name,
+                addr=addr,
+                state=state,
+                last_seen=last_seen,
+                deadline=deadline
+            )
+            if result.ok is False:
+                return result.seen_at(last_seen)
+            return result
+        result = yield from self._command(
+            self._admit_command(name),
+            name=name,
+            addr=addr,
+            state=state,
+            last_seen=last_seen,
+            expires={'at': deadline}
+        )
+        return result
+
+
+    def _admit_command(self, name):
+        """ Admits a command to the lane for a device.  Reads arriving after
+            the command must see its result, so they neither join an earlier
+            read nor use the cached state.  Returns the lane ticket.
+        """
+        ticket = self._admit(name)
+        self._inflight.pop(ticket[0], None)
+        self._commands[ticket[0]] += 1
+        self.state_cache.invalidate(name)
+        return ticket
+
+
+    @asyncio.coroutine
+    def _coalesce(self, name=None, addr=None, state=None, last_seen=None,
+                  deadline=None):
+        """ Joins the pending command for a device, replacing its state, or
+            opens a new coalescing window if none is pending.  Every caller
+            receives the result of the single command that is sent.
+        """
+        key = normalize_name(name)
+        pending = self._coalescing.get(key)
+        if pending is not None:
+            self.logger.debug(
+                'Coalescing command [%s] for [%s] into pending command [%s]',
+                state,
+                name,
+                pending['state']
+            )
+            pending['state'] = state
+            self._extend(pending['expires'], deadline)
+        else:
+            ticket = self._admit_command(name)
+            pending = {'state': state, 'expires': {'at': deadline}}
+            pending['task'] = asyncio.ensure_future(
+                self._send_coalesced(key, pending, ticket, name, addr, last_seen),
+                loop=self.loop
+            )
+            pending['task'].add_done_callback(
+                functools.partial(self._release_idle, ticket)
+            )
+            self._coalescing[key] = pending
+        result = yield from asyncio.shield(pending['task'])
+        return result
+
+
+    @asyncio.coroutine
+    def _send_coalesced(self, key, pending, ticket, name, addr, last_seen):
+        """ Waits out the coalescing window, then sends the final state """
+        try:
+            yield from asyncio.sleep(self.coalesce_window)
+        finally:
+            # Commands arriving from now on open a new window
+            if self._coalescing.get(key) is pending:
+                del self._coalescing[key]
+        result = yield from self._command(
+            ticket,
+            name=name,
+            addr=addr,
+            state=pending['state'],
+            last_seen=last_seen,
+            expires=pending['expires']
+        )
+        return result
+
+
+    @asyncio.coroutine
+    def _command(self, ticket, name=None, addr=None, state=None, last_seen=None,
+                 expires=None):
+        """ Sends an "on" or "off" command to the physical device once its
+            lane ticket comes up """
+        if state == 'on':
+            func = self.api.turn_on
+        else:
+            func = self.api.turn_off
+        # Excess commands keep their place in the lane but wait for a token
+        delay = self.limiter.reserve(
+            name,
+            dev_type=self.device_types.get(normalize_name(name))
+        )
+        if delay > 0:
+            try:
+                yield from asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self._release(ticket)
+                raise
+        try:
+            result = yield from self._in_lane(
+                ticket,
+                COMMAND,
+                func,
+                name=name,
+                addr=addr,
+                last_seen=last_seen,
+                expires=expires
+            )
+        except DeadlineExpired:
+            self.expired['command'] += 1
+            self.logger.info(
+                'Command [%s] to [%s] expired before it was sent',
+                state,
+                name
+            )
+            return WemoResult('expired', last_seen, 0.0, 'expired')
+        except asyncio.TimeoutError:
+            self.logger.warning(
+                'Command [%s] to [%s] @ [%s] timed out after %s seconds',
+                state,
+                name,
+                addr,
+                self.call_timeout
+            )
+            result = offline(last_seen, self.call_timeout, 'timed out')
+        except Exception as exc:
+            self.logger.exception(
+                'Command [%s] to [%s] @ [%s] failed',
+                state,
+                name,
+                addr
+            )
+            result = offline(last_seen, error=repr(exc))
+        self._track_result(name, addr, result)
+        # Confirm the new state with a poll shortly after the command
+        if name in self.scheduler:
+            self.scheduler.poke(name, self.poll_after_command)
+            self.poll_wakeup.set()
+        return result
+
+
+    @asyncio.coroutine
+    def retry_offline(self):
+        """ Background task that retries discovery of devices whose backoff
+            window has expired, clearing them once they are found again """
+        self.logger.info('Starting offline device retry task')
+        yield from self.ready.wait()
+        while True:
+            for name, addr in self.backoff.due():
+                # Found elsewhere since, e.g. by SSDP at a new address
+                if self.api.is_resolved(name=name):
+                    self.logger.info('Device [%s] is back online', name)
+                    self.backoff.record_success(name)
+                    continue
+                device = yield from self.discover(name=name, addr=addr)
+                if device is not None:
+                    self.logger.info('Device [%s] @ [%s] is back online', name, addr)
+                    self.backoff.record_success(name)
+                else:
+                    self.backoff.record_failure(name, addr=addr)
+            # Sleep until the next retry is due
+            sleep_time = self.backoff.next_retry()
+            if sleep_time is None or sleep_time > self.backoff.initial:
+                sleep_time = self.backoff.initial
+            yield from asyncio.sleep(sleep_time)
+
+
+    def _set_readiness(self, readiness):
+        """ Records and logs progress through the start-up stages """
+        self.readiness = readiness
+        self.logger.info('Wemo gateway start-up stage: %s', readiness)
+        if readiness == 'ready':
+            self.ready.set()
+
+
+    def _starting_up(self, name, addr):
+        """ Returns True while start-up discovery is still running and the
+            device has not been resolved yet.  Discovery of the device is
+            started in the background so later requests can find it.
+        """
+        if self.ready.is_set() or self.api.is_resolved(name=name, addr=addr):
+            return False
+        key = normalize_name(name)
+        if key not in self._resolving:
+            task = asyncio.ensure_future(
+                self.discover(name=name, addr=addr),
+                loop=self.loop
+            )
+            self._resolving[key] = task
+            task.add_done_callback(
+                functools.partial(self._task_done, self._resolving, key)
+            )
+        self.logger.debug(
+            'Device [%s] not resolved yet during start-up.  Reporting offline',
+            name
+        )
+        return True
+
+
+    @asyncio.coroutine
+    def _find_port(self, addr, limiter):
+        """ Finds the port a device is listening on by opening TCP
+            connections to its candidate ports, last known port first.
+            Returns the port, or None if the host did not answer.
+        """
+        yield from limiter.acquire()
+        try:
+            for port in self.api.candidate_ports(addr):
+                try:
+                    reader, writer = yield from asyncio.wait_for(
+                        asyncio.open_connection(addr, port),
+                        self.resolve_timeout
+                    )
+                except asyncio.TimeoutError:
+                    # Host is not answering at all, no point trying further
+                    self.logger.debug('Timed out connecting to %s:%s', addr, port)
+                    return None
+                except OSError:
+                    continue
+                writer.close()
+                return port
+        finally:
+            limiter.release()
+        return None
+
+
+    @asyncio.coroutine
+    def _resolve_one(self, device, limiter):
+        """ Resolves a single configured device.  Returns True if found """
+        port = yield from self._find_port(device.dev_addr, limiter)
+        if port is None:
+            return False
+        try:
+            handle = yield from self._in_slot(
+                BACKGROUND,
+                self.api.connect_at,
+                name=device.dev_name,
+                addr=device.dev_addr,
+                port=port
+            )
+        except Exception:
+            handle = None
+        return handle is not None
+
+
+    @asyncio.coroutine
+    def resolve_configured(self, devices=None):
+        """ Probes the address of every configured wemo device concurrently,
+            with at most resolve_limit connections open at once, and fills
+            the registry in a single pass.  Returns the names of configured
+            devices that could not be found.
+        """
+        devices = self.devices if devices is None else devices
+        pending = [
+            device for device in devices
+            if 'wemo' in device.dev_type and
+            check_ipv4(device.dev_addr) is True and
+            not self.api.is_resolved(name=device.dev_name, addr=device.dev_addr)
+        ]
+        if len(pending) == 0:
+            return []
+        self.logger.info('Resolving %s configured wemo devices', len(pending))
+        limiter = asyncio.Semaphore(self.resolve_limit)
+        results = yield from asyncio.gather(
+            *[self._resolve_one(device, limiter) for device in pending],
+            return_exceptions=True
+        )
+        missing = []
+        for device, found in zip(pending, results):
+            if found is True:
+                self.backoff.record_success(device.dev_name)
+            else:
+                missing.append(device.dev_name)
+                self.backoff.record_failure(device.dev_name, addr=device.dev_addr)
+        if len(missing) > 0:
+            self.logger.warning('Configured wemo devices not found: %s', missing)
+        return missing
+
+
+    @asyncio.coroutine
+    def warm_start(self):
+        """ Background start-up task.  Loads the devices saved by a previous
+            run, reconnects to them, probes the addresses of any configured
+            devices still missing, then runs a full SSDP discovery for
+            anything new.  Progress is reported through readiness.
+        """
+        self._set_readiness('loading')
+        try:
+            yield from self._call(self.api.load_registry)
+        except Exception:
+            self.logger.exception('Failed to load saved device registry')
+        saved = [
+            entry for entry in self.api.registry.entries if entry.device is None
+        ]
+        if len(saved) > 0:
+            self._set_readiness('reconnecting')
+            self.logger.info('Reconnecting to %s saved wemo devices', len(saved))
+            # Reconnects are background work, capped and yielding to commands
+            results = yield from asyncio.gather(
+                *[
+                    self._in_slot(BACKGROUND, self.api.connect, entry)
+                    for entry in saved
+                ],
+                return_exceptions=True
+            )
+            missing = [
+                entry.name for entry, device in zip(saved, results)
+                if device is None or isinstance(device, Exception)
+            ]
+            if len(missing) > 0:
+                self.logger.warning(
+                    'Saved devices not reachable at their last location: %s',
+                    missing
+                )
+        self._set_readiness('resolving')
+        try:
+            yield from self.resolve_configured()
+        except Exception:
+            self.logger.exception('Failed to resolve configured devices')
+        self._set_readiness('discovering')
+        try:
+            found = yield from self._call_with_timeout(
+                self.discovery_timeout,
+                self.api.discover_all
+            )
+            self.logger.info('Network discovery found %s wemo devices', found)
+            self._clear_resolved()
+        except asyncio.TimeoutError:
+            self.logger.warning(
+                'Network discovery did not finish within %s seconds',
+                self.discovery_timeout
+            )
+        except Exception:
+            self.logger.exception('Network discovery failed')
+        self._set_readiness('ready')
+
+
+    def _clear_resolved(self):
+        """ Clears the backoff of every device that now has a live handle,
+            such as devices that network discovery found at a new address """
+        for name in self.backoff.names():
+            if self.api.is_resolved(name=name):
+                self.logger.info('Device [%s] found by network discovery', name)
+                self.backoff.record_success(name)
+
+
+    @asyncio.coroutine
+    def listen_ssdp(self):
+        """ Starts the passive SSDP listener when configured, so devices that
+            join the network or change address are picked up from their own
+            announcements without any probe traffic """
+        if self.ssdp_listener is not True:
+            self.logger.debug('Passive SSDP listener disabled')
+            return
+        try:
+            self.ssdp_transport, protocol = yield from self.loop.create_datagram_endpoint(
+                lambda: SsdpListener(
+                    self._on_ssdp_alive,
+                    self._on_ssdp_byebye,
+                    logger=self.logger
+                ),
+                sock=create_ssdp_socket()
+            )
+        except OSError:
+            self.logger.exception('Failed to start passive SSDP listener')
+
+
+    def _on_ssdp_alive(self, udn, location):
+        """ Handles an alive announcement.  Devices already registered at the
+            announced location are left alone; anything new or moved is
+            connected to in the background """
+        host, port = location_host_port(location)
+        entry = self.api.registry.by_udn(udn)
+        if entry is not None and entry.device is not None and \
+                entry.addr == host and entry.port == port:
+            return
+        if udn in self._announced:
+            return
+        self.logger.info('Device %s announced at new location: %s', udn, location)
+        task = asyncio.ensure_future(
+            self._connect_announced(udn, location),
+            loop=self.loop
+        )
+        self._announced[udn] = task
+        task.add_done_callback(
+            functools.partial(self._task_done, self._announced, udn)
+        )
+
+
+    @asyncio.coroutine
+    def _connect_announced(self, udn, location):
+        """ Connects to a device at the location it announced """
+        try:
+            device = yield from self._in_slot(
+                BACKGROUND,
+                self.api.connect_location,
+                udn,
+                location
+            )
+        except Exception:
+            self.logger.warning('Failed to connect to announced device: %s', location)
+            return
+        if device is not None:
+            self.backoff.record_success(device.name)
+            self.state_cache.invalidate(device.name)
+
+
+    def _on_ssdp_byebye(self, udn):
+        """ Handles a byebye announcement by dropping the live handle for the
+            device.  Its saved location is kept for a cheap reconnect. """
+        entry = self.api.forget(udn)
+        if entry is not None:
+            self.logger.info('Device [%s] announced it is leaving the network', entry.name)
+            self.state_cache.invalidate(entry.name)
+            self.backoff.record_failure(entry.name, addr=entry.addr)
+
+
+    @asyncio.coroutine
+    def start_subscriptions(self):
+        """ Enables push state updates from UPnP event subscriptions when
+            configured.  Polling continues as a slower safety net.
+        """
+        if self.subscriptions is not True:
+            self.logger.debug('Event subscriptions disabled')
+            return
+        try:
+            yield from self._call(
+                self.api.start_subscriptions,
+                self._on_event
+            )
+        except Exception:
+            self.logger.exception('Failed to start event subscriptions')
+            self.subscriptions = False
+
+
+    def _on_event(self, name, addr, status, last_seen):
+        """ Event callback invoked from the pywemo event thread.  Hands the
+            update over to the event loop """
+        self.loop.call_soon_threadsafe(
+            self._apply_event, name, addr, status, last_seen
+        )
+
+
+    def _apply_event(self, name, addr, status, last_seen):
+        """ Records a state change pushed by a device """
+        self.logger.debug(
+            'Device [%s] @ [%s] reported status [%s]',
+            name,
+            addr,
+            status
+        )
+        self.backoff.record_success(name)
+        self.state_cache.put(name, status, last_seen)
+        if name in self.scheduler:
+            self.scheduler.record(name, status)
+
+
+    def metrics(self):
+        """ Returns a dict of gateway counters for logging """
+        return {
+            'breakers': self.api.breakers.stats(),
+            'slots_waiting': self.slots.waiting(),
+            'rate_limits': dict(self.limiter.counters),
+            'expired': dict(self.expired)
+        }
+
+
+    def close(self):
+        """ Releases the gateway thread pool without waiting for hung calls """
+        if self.ssdp_transport is not None:
+            self.ssdp_transport.close()
+        if self.subscriptions is True:
+            self.api.stop_subscriptions()
+        self.api.sessions.close()
+        self.logger.info('Shutting down wemo gateway thread pool')
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,44 @@
+#!/usr/bin/python3
+""" wemo_result.py:
+    Result record returned by every device operation
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import collections
+
+
+# Authorship Info *************************************************************
+__author__ = "Christopher Maue"
+__copyright__ = "Copyright 2017, The B.O.B. Project"
+__credits__ = ["Christopher Maue"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Christopher Maue"
+__email__ = "csmaue@gmail.com"
+__status__ = "Development"
+
+
+# Result definition ***********************************************************
+class WemoResult(collections.namedtuple(
+        'WemoResult', ['status', 'timestamp', 'latency', 'error'])):
+    """ Immutable outcome of a single device operation.  status is the
+        device status ('0'/'1', 'on'/'off' or 'offline'), timestamp is when
+        the device was last seen, latency is the seconds the operation took
+        and error describes why it failed, or is None on success.
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """ Returns True if the device answered """
+        return self.status != 'offline'
+
+    def seen_at(self, timestamp):
+        """ Returns a copy of the result reporting a different last seen
+            timestamp """
+        return self._replace(timestamp=timestamp)
+
+
+def offline(timestamp=None, latency=0.0, error=None):
+    """ Returns the result for a device that could not be reached """
+    return WemoResult('offline', timestamp, latency, error)
@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+""" test_backoff.py:
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import logging
+import unittest
+import os
+import sys
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from bob_wemo_service.backoff import DiscoveryBackoff
+
+
+# Define test class ***********************************************************
+class TestDiscoveryBackoff(unittest.TestCase):
+    """ unittests for DiscoveryBackoff Class, methods, and functions """
+
+    def __init__(self, *args, **kwargs):
+        logging.basicConfig(stream=sys.stdout)
+        self.log = logging.getLogger(__name__)
+        self.log.level = logging.DEBUG
+        super(TestDiscoveryBackoff, self).__init__(*args, **kwargs)
+
+
+    def setUp(self):
+        self.backoff = DiscoveryBackoff(
+            logger=self.log, initial=5, maximum=60, jitter=0
+        )
+        super(TestDiscoveryBackoff, self).setUp()
+
+
+    def test_exponential_delay(self):
+        """ test delay doubles on each failure up to the maximum """
+        delays = [
+            self.backoff.record_failure('fylt1', now=0) for i in range(6)
+        ]
+        self.assertEqual(delays, [5, 10, 20, 40, 60, 60])
+
+
+    def test_jitter(self):
+        """ test jitter keeps the delay within the configured band """
+        self.backoff.jitter = 0.2
+        for i in range(50):
+            self.backoff.record_success('fylt1')
+            delay = self.backoff.record_failure('fylt1', now=0)
+            self.assertTrue(4.0 <= delay <= 6.0)
+
+
+    def test_window(self):
+        """ test devices are blocked until their retry time """
+        self.backoff.record_failure('FYLT1', addr='192.168.86.21', now=100)
+        self.assertTrue(self.backoff.is_blocked('fylt1', now=101))
+        self.assertFalse(self.backoff.is_blocked('bylt1', now=101))
+        self.assertEqual(self.backoff.due(now=101), [])
+        self.assertEqual(self.backoff.next_retry(now=101), 4)
+        self.assertFalse(self.backoff.is_blocked('fylt1', now=105))
+        self.assertEqual(self.backoff.due(now=105), [('FYLT1', '192.168.86.21')])
+
+
+    def test_success_clears(self):
+        """ test a successful discovery clears the entry """
+        self.backoff.record_failure('fylt1', now=0)
+        self.assertEqual(self.backoff.names(), ['fylt1'])
+        self.assertTrue(self.backoff.record_success('fylt1'))
+        self.assertEqual(self.backoff.names(), [])
+        self.assertFalse(self.backoff.record_success('fylt1'))
+        self.assertFalse(self.backoff.is_blocked('fylt1', now=1))
+        self.assertEqual(self.backoff.next_retry(now=1), None)
+        self.assertEqual(self.backoff.record_failure('fylt1', now=2), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
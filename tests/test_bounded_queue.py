@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+""" test_bounded_queue.py:
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import logging
+import unittest
+import os
+import sys
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from bob_wemo_service.bounded_queue import BoundedQueue
+from bob_wemo_service.bounded_queue import field_key
+
+
+# Define test class ***********************************************************
+class TestBoundedQueue(unittest.TestCase):
+    """ unittests for BoundedQueue Class, methods, and functions """
+
+    def __init__(self, *args, **kwargs):
+        logging.basicConfig(stream=sys.stdout)
+        self.log = logging.getLogger(__name__)
+        self.log.level = logging.DEBUG
+        super(TestBoundedQueue, self).__init__(*args, **kwargs)
+
+
+    def drain(self, queue):
+        """ Returns every item left in a queue """
+        items = []
+        while not queue.empty():
+            items.append(queue.get_nowait())
+        return items
+
+
+    def test_reject(self):
+        """ test new messages are refused once the queue is full """
+        queue = BoundedQueue(maxsize=2, policy='reject', logger=self.log)
+        self.assertEqual([queue.offer(i) for i in range(3)], [True, True, False])
+        self.assertEqual(self.drain(queue), [0, 1])
+        self.assertEqual(queue.shed, {'rejected': 1})
+
+
+    def test_drop_oldest(self):
+        """ test the oldest message makes room for a new one """
+        queue = BoundedQueue(maxsize=2, policy='drop_oldest', logger=self.log)
+        self.assertEqual([queue.offer(i) for i in range(4)], [True] * 4)
+        self.assertEqual(self.drain(queue), [2, 3])
+        self.assertEqual(queue.shed, {'dropped_oldest': 2})
+
+
+    def test_drop_duplicate(self):
+        """ test an older message for the same device makes room """
+        queue = BoundedQueue(
+            maxsize=2,
+            policy='drop_duplicate',
+            key=field_key(5, 6),
+            logger=self.log
+        )
+        queue.offer('1,a,1,b,2,602,fylt1,0')
+        queue.offer('2,a,1,b,2,602,bylt1,0')
+        self.assertTrue(queue.offer('3,a,1,b,2,602,fylt1,1'))
+        self.assertFalse(queue.offer('4,a,1,b,2,604,porch,1'))
+        self.assertEqual(
+            self.drain(queue),
+            ['2,a,1,b,2,602,bylt1,0', '3,a,1,b,2,602,fylt1,1']
+        )
+        self.assertEqual(queue.shed, {'dropped_duplicate': 1, 'rejected': 1})
+
+
+    def test_unbounded(self):
+        """ test a queue without a bound never sheds """
+        queue = BoundedQueue(logger=self.log)
+        self.assertTrue(all(queue.offer(i) for i in range(1000)))
+        self.assertEqual(queue.qsize(), 1000)
+        self.assertFalse(queue.blocking)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+""" test_circuit_breaker.py:
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import logging
+import unittest
+import os
+import sys
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from bob_wemo_service.circuit_breaker import BreakerBoard
+
+
+# Define test class ***********************************************************
+class TestBreakerBoard(unittest.TestCase):
+    """ unittests for BreakerBoard Class, methods, and functions """
+
+    def __init__(self, *args, **kwargs):
+        logging.basicConfig(stream=sys.stdout)
+        self.log = logging.getLogger(__name__)
+        self.log.level = logging.DEBUG
+        super(TestBreakerBoard, self).__init__(*args, **kwargs)
+
+
+    def setUp(self):
+        self.board = BreakerBoard(
+            logger=self.log, threshold=0.5, min_calls=4, window=10, cooldown=30
+        )
+        super(TestBreakerBoard, self).setUp()
+
+
+    def test_opens_on_failure_rate(self):
+        """ test the breaker opens once the failure rate reaches threshold """
+        self.board.record_success('fylt1', now=0)
+        self.board.record_failure('fylt1', now=0)
+        self.board.record_success('fylt1', now=0)
+        self.assertEqual(self.board.state('fylt1'), 'closed')
+        self.board.record_failure('fylt1', now=0)
+        self.assertEqual(self.board.state('FYLT1'), 'open')
+        self.assertFalse(self.board.allow('fylt1', now=10))
+        self.assertTrue(self.board.allow('bylt1', now=10))
+        self.assertEqual(self.board.stats(), {'opened': 1, 'rejected': 1, 'open': ['fylt1']})
+
+
+    def test_min_calls(self):
+        """ test a few failures alone do not open the breaker """
+        for i in range(3):
+            self.board.record_failure('fylt1', now=0)
+        self.assertEqual(self.board.state('fylt1'), 'closed')
+
+
+    def test_single_probe(self):
+        """ test only one probe is allowed through a half-open breaker """
+        for i in range(4):
+            self.board.record_failure('fylt1', now=0)
+        self.assertFalse(self.board.allow('fylt1', now=29))
+        self.assertTrue(self.board.allow('fylt1', now=30))
+        self.assertEqual(self.board.state('fylt1'), 'half-open')
+        self.assertFalse(self.board.allow('fylt1', now=31))
+        # Successful probe closes the breaker with a clean history
+        self.board.record_success('fylt1', now=32)
+        self.assertEqual(self.board.state('fylt1'), 'closed')
+        self.board.record_failure('fylt1', now=33)
+        self.assertTrue(self.board.allow('fylt1', now=33))
+
+
+    def test_failed_probe(self):
+        """ test a failed probe re-opens the breaker for a new cooldown """
+        for i in range(4):
+            self.board.record_failure('fylt1', now=0)
+        self.assertTrue(self.board.allow('fylt1', now=30))
+        self.board.record_failure('fylt1', now=31)
+        self.assertEqual(self.board.state('fylt1'), 'open')
+        self.assertFalse(self.board.allow('fylt1', now=60))
+        self.assertTrue(self.board.allow('fylt1', now=61))
+        self.assertEqual(self.board.counters['opened'], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+#!/usr/bin/python3
+""" test_device_registry.py:
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import logging
+import tempfile
+import unittest
+import os
+import sys
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from bob_wemo_service.device_registry import WemoRegistry
+
+
+# Fake pywemo device **********************************************************
+class FakeDevice(object):
+    """ Minimal stand-in for a pywemo device handle """
+    def __init__(self, name, host):
+        self.name = name
+        self.host = host
+
+
+# Define test class ***********************************************************
+class TestWemoRegistry(unittest.TestCase):
+    """ unittests for WemoRegistry Class, methods, and functions """
+
+    def __init__(self, *args, **kwargs):
+        logging.basicConfig(stream=sys.stdout)
+        self.log = logging.getLogger(__name__)
+        self.log.level = logging.DEBUG
+        super(TestWemoRegistry, self).__init__(*args, **kwargs)
+
+
+    def setUp(self):
+        self.registry = WemoRegistry(logger=self.log)
+        super(TestWemoRegistry, self).setUp()
+
+
+    def test_lookup(self):
+        """ test lookup by name, address, and udn """
+        device = FakeDevice('FYLT1', '192.168.86.21')
+        self.registry.update(device, udn='uuid:Socket-1')
+        self.assertEqual(self.registry.by_name('fylt1').device, device)
+        self.assertEqual(self.registry.by_name(' Fylt1 ').device, device)
+        self.assertEqual(self.registry.by_addr('192.168.86.21').device, device)
+        self.assertEqual(self.registry.by_udn('uuid:Socket-1').device, device)
+        self.assertEqual(self.registry.by_name('bylt1'), None)
+        self.assertEqual(self.registry.devices, [device])
+
+
+    def test_rediscovery_updates_in_place(self):
+        """ test re-registering a device does not grow the registry """
+        first = FakeDevice('fylt1', '192.168.86.21')
+        second = FakeDevice('fylt1', '192.168.86.21')
+        entry = self.registry.update(first, udn='uuid:Socket-1')
+        for i in range(10):
+            self.registry.update(second, udn='uuid:Socket-1')
+        self.assertEqual(len(self.registry), 1)
+        self.assertIs(self.registry.by_name('fylt1'), entry)
+        self.assertIs(entry.device, second)
+
+
+    def test_address_change(self):
+        """ test a new IP address replaces the old address index """
+        self.registry.update(FakeDevice('fylt1', '192.168.86.21'), udn='uuid:Socket-1')
+        self.registry.update(FakeDevice('fylt1', '192.168.86.50'), udn='uuid:Socket-1')
+        self.assertEqual(self.registry.by_addr('192.168.86.21'), None)
+        self.assertEqual(self.registry.by_addr('192.168.86.50').name, 'fylt1')
+        # Address taken over by another device
+        self.registry.update(FakeDevice('bylt1', '192.168.86.50'), udn='uuid:Socket-2')
+        self.assertEqual(self.registry.by_addr('192.168.86.50').name, 'bylt1')
+        self.assertEqual(self.registry.by_name('fylt1').addr, None)
+
+
+    def test_rename(self):
+        """ test a renamed device is re-keyed by its udn """
+        self.registry.update(FakeDevice('fylt1', '192.168.86.21'), udn='uuid:Socket-1')
+        self.registry.update(FakeDevice('porch', '192.168.86.21'), udn='uuid:Socket-1')
+        self.assertEqual(len(self.registry), 1)
+        self.assertEqual(self.registry.by_name('fylt1'), None)
+        self.assertEqual(self.registry.by_name('porch').udn, 'uuid:Socket-1')
+
+
+    def test_remove(self):
+        """ test removing a device clears every index """
+        self.registry.update(FakeDevice('fylt1', '192.168.86.21'), udn='uuid:Socket-1')
+        self.assertEqual(self.registry.remove('FYLT1').name, 'fylt1')
+        self.assertEqual(len(self.registry), 0)
+        self.assertEqual(self.registry.by_addr('192.168.86.21'), None)
+        self.assertEqual(self.registry.by_udn('uuid:Socket-1'), None)
+        self.assertEqual(self.registry.remove('fylt1'), None)
+
+
+    def test_save_and_load(self):
+        """ test the registry survives a round trip through its file """
+        device = FakeDevice('fylt1', '192.168.86.21')
+        self.registry.update(
+            device,
+            udn='uuid:Socket-1',
+            port=49153,
+            url='http://192.168.86.21:49153/setup.xml',
+            model='Socket'
+        )
+        self.assertTrue(self.registry.dirty)
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'registry', 'registry.json')
+            self.registry.save(filename)
+            self.assertFalse(self.registry.dirty)
+            restored = WemoRegistry(logger=self.log)
+            self.assertEqual(restored.load(filename), 1)
+        entry = restored.by_udn('uuid:Socket-1')
+        self.assertEqual(entry.name, 'fylt1')
+        self.assertEqual(entry.addr, '192.168.86.21')
+        self.assertEqual(entry.port, 49153)
+        self.assertEqual(entry.url, 'http://192.168.86.21:49153/setup.xml')
+        self.assertEqual(entry.model, 'Socket')
+        self.assertEqual(entry.device, None)
+        self.assertFalse(restored.dirty)
+        # Re-registering identical values leaves the registry clean
+        restored.update(device, udn='uuid:Socket-1', port=49153)
+        self.assertFalse(restored.dirty)
+        restored.update(device, udn='uuid:Socket-1', port=49154)
+        self.assertTrue(restored.dirty)
+
+
+    def test_port_cache(self):
+        """ test ports are remembered by address and saved with the registry """
+        self.registry.update(
+            FakeDevice('fylt1', '192.168.86.21'), udn='uuid:Socket-1', port=49153
+        )
+        self.assertEqual(self.registry.port_for('192.168.86.21'), 49153)
+        self.registry.remember_port('192.168.86.40', 49154)
+        self.registry.forget_port('192.168.86.21')
+        self.assertEqual(self.registry.port_for('192.168.86.21'), None)
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'registry.json')
+            self.registry.save(filename)
+            restored = WemoRegistry(logger=self.log)
+            restored.load(filename)
+        self.assertEqual(restored.port_for('192.168.86.40'), 49154)
+        # Loading the entry restores its own port as well
+        self.assertEqual(restored.port_for('192.168.86.21'), 49153)
+        self.assertFalse(restored.dirty)
+
+
+    def test_load_missing_file(self):
+        """ test loading a registry file that does not exist """
+        with tempfile.TemporaryDirectory() as folder:
+            self.assertEqual(
+                self.registry.load(os.path.join(folder, 'missing.json')), 0
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -229,5 +229,21 @@ class TestGetDeviceStateMessage(unittest.TestCase):
         self.assertEqual(self.message.complete, self.temp_str2)
 
 
+    def test_force(self):
+        """ test the optional force update field """
+        self.temp_str = '142,127.0.0.1,12000,192.168.5.45,13000,301,' \
+                        'device01,192.168.86.12,on,2017-10-04 07:01:03'
+        self.message.complete = copy.copy(self.temp_str)
+        self.assertEqual(self.message.force, False)
+        self.assertEqual(self.message.complete, self.temp_str)
+        self.message.complete = copy.copy(self.temp_str) + ',1'
+        self.assertEqual(self.message.force, True)
+        self.assertEqual(self.message.complete, self.temp_str + ',1')
+        self.message.force = 'false'
+        self.assertEqual(self.message.force, False)
+        self.message.force = True
+        self.assertEqual(self.message.force, True)
+
+
 if __name__ == "__main__":
     unittest.main()
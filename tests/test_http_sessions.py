@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+""" test_http_sessions.py:
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import logging
+import unittest
+import os
+import sys
+import requests
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from bob_wemo_service.http_sessions import SessionPool
+
+
+# Fake session ****************************************************************
+class FakeSession(object):
+    """ Stand-in for requests.Session """
+    def __init__(self):
+        self.closed = False
+        self.posts = []
+        self.error = None
+
+    def post(self, url, *args, **kwargs):
+        self.posts.append(url)
+        if self.error is not None:
+            raise self.error
+        return 'response'
+
+    def close(self):
+        self.closed = True
+
+
+# Define test class ***********************************************************
+class TestSessionPool(unittest.TestCase):
+    """ unittests for SessionPool Class, methods, and functions """
+
+    def __init__(self, *args, **kwargs):
+        logging.basicConfig(stream=sys.stdout)
+        self.log = logging.getLogger(__name__)
+        self.log.level = logging.DEBUG
+        super(TestSessionPool, self).__init__(*args, **kwargs)
+
+
+    def setUp(self):
+        self.now = 100.0
+        self.pool = SessionPool(
+            logger=self.log,
+            max_idle=30,
+            clock=lambda: self.now,
+            factory=FakeSession
+        )
+        super(TestSessionPool, self).setUp()
+
+
+    def test_reuse_and_idle_expiry(self):
+        """ test a session is reused until it sits idle for too long """
+        url = 'http://192.168.86.21:49153/upnp/control/basicevent1'
+        first = self.pool.session(url)
+        self.now += 20
+        self.assertIs(self.pool.session(url), first)
+        self.now += 31
+        second = self.pool.session(url)
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        self.assertFalse(second.closed)
+        self.assertEqual(len(self.pool), 1)
+
+
+    def test_evict_by_host(self):
+        """ test every session to a host is closed on eviction """
+        first = self.pool.session('http://192.168.86.21:49153/upnp')
+        second = self.pool.session('http://192.168.86.21:49154/upnp')
+        other = self.pool.session('http://192.168.86.22:49153/upnp')
+        self.assertEqual(len(self.pool), 3)
+        self.pool.evict('192.168.86.21')
+        self.assertTrue(first.closed and second.closed)
+        self.assertFalse(other.closed)
+        self.assertEqual(len(self.pool), 1)
+
+
+    def test_evict_on_failure(self):
+        """ test a failed post drops its session and re-raises """
+        url = 'http://192.168.86.21:49153/upnp/control/basicevent1'
+        self.assertEqual(self.pool.post(url, data='ok'), 'response')
+        session = self.pool.session(url)
+        session.error = requests.exceptions.ConnectionError('reset')
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.pool.post(url, data='fail')
+        self.assertTrue(session.closed)
+        self.assertEqual(len(self.pool), 0)
+        self.assertIsNot(self.pool.session(url), session)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -15,6 +15,37 @@ if __name__ == "__main__":
 from bob_wemo_service.message_handlers import MessageHandler
 
 
+# Fake connection *************************************************************
+class FakeReader(object):
+    """ Stand-in for asyncio.StreamReader holding one message """
+    def __init__(self, message):
+        self.data = message.encode()
+
+    @asyncio.coroutine
+    def read(self, size):
+        return self.data[:size]
+
+
+class FakeWriter(object):
+    """ Stand-in for asyncio.StreamWriter recording what was sent """
+    def __init__(self):
+        self.data = bytes()
+        self.closed = False
+
+    def get_extra_info(self, name):
+        return ('127.0.0.1', 27061)
+
+    def write(self, data):
+        self.data += data
+
+    @asyncio.coroutine
+    def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
 # Define test class ***********************************************************
 class TestMessageHandler(unittest.TestCase):
     """ unittests for Message handler Class, methods, and functions """
@@ -62,5 +93,66 @@ class TestMessageHandler(unittest.TestCase):
         asyncio.Task.all_tasks()
 
 
+    def create_handler(self, **kwargs):
+        """ Returns a message handler on a fresh event loop """
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self.addCleanup(asyncio.set_event_loop, self.loop)
+        self.addCleanup(loop.close)
+        return MessageHandler(loop, logger=self.log, **kwargs)
+
+
+    def receive(self, mh, message):
+        """ Starts handling an inbound message.  Returns the task and the
+            writer the reply goes to """
+        writer = FakeWriter()
+        task = asyncio.ensure_future(
+            mh.handle_msg_in(FakeReader(message), writer),
+            loop=mh.loop
+        )
+        return task, writer
+
+
+    def test_nack_when_refused(self):
+        """ test a message the inbound queue refuses is NACK'd """
+        mh = self.create_handler(in_maxsize=1, in_policy='reject')
+        first, first_writer = self.receive(
+            mh, '101,127.0.0.1,27062,127.0.0.1,27061,602,lamp'
+        )
+        second, second_writer = self.receive(
+            mh, '102,127.0.0.1,27062,127.0.0.1,27061,602,fan'
+        )
+        mh.loop.run_until_complete(asyncio.wait([first, second]))
+        self.assertEqual(first_writer.data, b'101')
+        self.assertEqual(second_writer.data, b'102,NACK')
+        self.assertTrue(first_writer.closed and second_writer.closed)
+        self.assertEqual(mh.msg_in_queue.qsize(), 1)
+        self.assertEqual(mh.msg_in_queue.shed['rejected'], 1)
+
+
+    def test_block_until_room(self):
+        """ test a blocking inbound queue holds the sender until there is
+            room, then ACKs """
+        mh = self.create_handler(in_maxsize=1, in_policy='block')
+        first, first_writer = self.receive(
+            mh, '101,127.0.0.1,27062,127.0.0.1,27061,602,lamp'
+        )
+        second, second_writer = self.receive(
+            mh, '102,127.0.0.1,27062,127.0.0.1,27061,602,fan'
+        )
+        mh.loop.run_until_complete(asyncio.wait([first, second], timeout=0.05))
+        self.assertTrue(first.done())
+        self.assertFalse(second.done())
+        self.assertEqual(second_writer.data, bytes())
+        arrival, message = mh.msg_in_queue.get_nowait()
+        self.assertTrue(message.startswith('101,'))
+        mh.loop.run_until_complete(second)
+        self.assertEqual(second_writer.data, b'102')
+        self.assertTrue(second_writer.closed)
+        arrival, message = mh.msg_in_queue.get_nowait()
+        self.assertTrue(message.startswith('102,'))
+        self.assertEqual(dict(mh.msg_in_queue.shed), {})
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+""" test_poll_scheduler.py:
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import logging
+import unittest
+import os
+import sys
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from bob_wemo_service.poll_scheduler import PollScheduler
+
+
+# Define test class ***********************************************************
+class TestPollScheduler(unittest.TestCase):
+    """ unittests for PollScheduler Class, methods, and functions """
+
+    def __init__(self, *args, **kwargs):
+        logging.basicConfig(stream=sys.stdout)
+        self.log = logging.getLogger(__name__)
+        self.log.level = logging.DEBUG
+        super(TestPollScheduler, self).__init__(*args, **kwargs)
+
+
+    def setUp(self):
+        self.scheduler = PollScheduler(
+            logger=self.log, interval=300, minimum=30, maximum=1800,
+            factor=2, growth=1.5
+        )
+        super(TestPollScheduler, self).setUp()
+
+
+    def test_new_devices_due(self):
+        """ test devices are due as soon as they are added """
+        self.scheduler.add('FYLT1', now=0)
+        self.scheduler.add('bylt1', now=0)
+        self.assertEqual(sorted(self.scheduler.due(now=0)), ['FYLT1', 'bylt1'])
+        # Handing a device out pushes it one interval ahead
+        self.assertEqual(self.scheduler.due(now=1), [])
+        self.assertEqual(self.scheduler.next_due(now=1), 299)
+
+
+    def test_volatile_device(self):
+        """ test a changing device is polled more often down to the minimum """
+        intervals = [
+            self.scheduler.record('fylt1', status, now=0)
+            for status in ['0', '1', '0', '1', '0', '1']
+        ]
+        self.assertEqual(intervals, [450, 225, 112.5, 56.25, 30, 30])
+
+
+    def test_stable_device(self):
+        """ test a steady device is polled less often up to the maximum """
+        for i in range(10):
+            interval = self.scheduler.record('fylt1', '1', now=0)
+        self.assertEqual(interval, 1800)
+        self.assertEqual(self.scheduler.interval_for('FYLT1'), 1800)
+        self.assertEqual(self.scheduler.next_due(now=0), 1800)
+
+
+    def test_offline_device(self):
+        """ test an unreachable device backs off without losing its state """
+        self.scheduler.record('fylt1', '1', now=0)
+        self.assertEqual(self.scheduler.record('fylt1', 'offline', now=0), 900)
+        # Coming back in the same state is not a change
+        self.assertEqual(self.scheduler.record('fylt1', '1', now=0), 1350)
+
+
+    def test_poke(self):
+        """ test a command brings the next poll forward """
+        self.scheduler.record('fylt1', '1', now=0)
+        self.scheduler.poke('fylt1', delay=5, now=10)
+        self.assertEqual(self.scheduler.next_due(now=10), 5)
+        self.assertEqual(self.scheduler.due(now=15), ['fylt1'])
+        # A poke never pushes a poll further out
+        self.scheduler.poke('fylt1', delay=5000, now=15)
+        self.assertEqual(self.scheduler.next_due(now=15), 450)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+""" test_priority_slots.py:
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import asyncio
+import logging
+import unittest
+import os
+import sys
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from bob_wemo_service.priority_slots import BACKGROUND
+from bob_wemo_service.priority_slots import COMMAND
+from bob_wemo_service.priority_slots import PrioritySlots
+from bob_wemo_service.priority_slots import QUERY
+
+
+# Define test class ***********************************************************
+class TestPrioritySlots(unittest.TestCase):
+    """ unittests for PrioritySlots Class, methods, and functions """
+
+    def __init__(self, *args, **kwargs):
+        logging.basicConfig(stream=sys.stdout)
+        self.log = logging.getLogger(__name__)
+        self.log.level = logging.DEBUG
+        super(TestPrioritySlots, self).__init__(*args, **kwargs)
+
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.slots = PrioritySlots(
+            2, limits={BACKGROUND: 1}, logger=self.log, loop=self.loop
+        )
+        super(TestPrioritySlots, self).setUp()
+
+
+    def tearDown(self):
+        self.loop.close()
+        super(TestPrioritySlots, self).tearDown()
+
+
+    def test_priority_order(self):
+        """ test freed slots go to the most urgent waiter first """
+        first = self.slots.acquire(QUERY)
+        second = self.slots.acquire(QUERY)
+        self.assertTrue(first.done() and second.done())
+        background = self.slots.acquire(BACKGROUND)
+        query = self.slots.acquire(QUERY)
+        command = self.slots.acquire(COMMAND)
+        self.assertEqual(self.slots.waiting(), {'background': 1, 'query': 1, 'command': 1})
+        self.slots.release(QUERY)
+        self.assertTrue(command.done())
+        self.assertFalse(query.done() or background.done())
+        self.slots.release(QUERY)
+        self.assertTrue(query.done())
+        self.assertFalse(background.done())
+
+
+    def test_background_cap(self):
+        """ test background work always leaves a slot for other classes """
+        first = self.slots.acquire(BACKGROUND)
+        second = self.slots.acquire(BACKGROUND)
+        self.assertTrue(first.done())
+        self.assertFalse(second.done())
+        command = self.slots.acquire(COMMAND)
+        self.assertTrue(command.done())
+        self.assertEqual(self.slots.free, 0)
+        self.slots.release(BACKGROUND)
+        self.assertTrue(second.done())
+
+
+    def test_cancel(self):
+        """ test withdrawn requests release or give up their slot """
+        granted = self.slots.acquire(QUERY)
+        self.slots.acquire(QUERY)
+        pending = self.slots.acquire(COMMAND)
+        self.slots.cancel(pending, COMMAND)
+        self.assertTrue(pending.cancelled())
+        self.assertEqual(self.slots.waiting(), {})
+        self.slots.cancel(granted, QUERY)
+        self.assertEqual(self.slots.free, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
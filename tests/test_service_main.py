@@ -0,0 +1,264 @@
+#!/usr/bin/python3
+""" test_service_main.py:
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import asyncio
+import collections
+import logging
+import time
+import unittest
+import os
+import sys
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from bob_wemo_service.bounded_queue import BoundedQueue
+from bob_wemo_service.get_device_state import GetDeviceStateMessage
+from bob_wemo_service.poll_scheduler import PollScheduler
+from bob_wemo_service.ref_num import RefNum
+from bob_wemo_service.service_main import MainTask
+from bob_wemo_service.set_device_state import SetDeviceStateMessage
+from bob_wemo_service.wemo_gateway import WemoGateway
+from tests.test_wemo_gateway import FakeDevice
+from tests.test_wemo_gateway import FakeWemoAPI
+
+
+MESSAGE_TYPES = {
+    'heartbeat': '100',
+    'heartbeat_ack': '101',
+    'get_device_state': '602',
+    'get_device_state_ack': '603',
+    'set_device_state': '604',
+    'set_device_state_ack': '605'
+}
+
+
+# Define test class ***********************************************************
+class TestMainTask(unittest.TestCase):
+    """ unittests for MainTask Class, methods, and functions """
+
+    def __init__(self, *args, **kwargs):
+        logging.basicConfig(stream=sys.stdout)
+        self.log = logging.getLogger(__name__)
+        self.log.level = logging.DEBUG
+        super(TestMainTask, self).__init__(*args, **kwargs)
+
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.ref_num = RefNum(logger=self.log)
+        self.api = FakeWemoAPI(delay=0.05)
+        self.gateway = WemoGateway(
+            logger=self.log,
+            api=self.api,
+            loop=self.loop,
+            settings={}
+        )
+        super(TestMainTask, self).setUp()
+
+
+    def tearDown(self):
+        self.gateway.executor.shutdown(wait=True)
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        super(TestMainTask, self).tearDown()
+
+
+    def create_task(self, **kwargs):
+        """ Returns a main task in front of the fake gateway """
+        return MainTask(
+            self.log,
+            ref=self.ref_num,
+            gw=self.gateway,
+            msg_in_queue=BoundedQueue(logger=self.log),
+            msg_out_queue=BoundedQueue(logger=self.log),
+            message_types=MESSAGE_TYPES,
+            **kwargs
+        )
+
+
+    def get_msg(self, name):
+        """ Returns a forced get_device_state message for a device """
+        return GetDeviceStateMessage(
+            logger=self.log,
+            ref=self.ref_num.new(),
+            dest_addr='127.0.0.1',
+            dest_port='27062',
+            source_addr='127.0.0.1',
+            source_port='27061',
+            msg_type=MESSAGE_TYPES['get_device_state'],
+            dev_name=name,
+            dev_addr='192.168.86.21',
+            dev_status='0',
+            dev_last_seen='2017-10-04 07:01:03',
+            force=True
+        ).complete
+
+
+    def set_msg(self, name, cmd):
+        """ Returns a set_device_state message for a device """
+        return SetDeviceStateMessage(
+            logger=self.log,
+            ref=self.ref_num.new(),
+            dest_addr='127.0.0.1',
+            dest_port='27062',
+            source_addr='127.0.0.1',
+            source_port='27061',
+            msg_type=MESSAGE_TYPES['set_device_state'],
+            dev_name=name,
+            dev_addr='192.168.86.21',
+            dev_cmd=cmd,
+            dev_status='0',
+            dev_last_seen='2017-10-04 07:01:03'
+        ).complete
+
+
+    def test_worker_order(self):
+        """ test messages for one device reach it in queue order across
+            several workers """
+        main = self.create_task(workers=3)
+        messages = [
+            self.set_msg('lamp', 'on'),
+            self.get_msg('lamp'),
+            self.set_msg('fan', 'on'),
+            self.set_msg('lamp', 'off')
+        ]
+        for msg in messages:
+            main.msg_in_queue.put_nowait((time.monotonic(), msg))
+
+        @asyncio.coroutine
+        def responses():
+            out = []
+            while len(out) < len(messages):
+                msg = yield from main.msg_out_queue.get()
+                out.append(msg)
+            return out
+
+        workers = [
+            asyncio.ensure_future(main.worker(worker_id))
+            for worker_id in range(main.workers)
+        ]
+        out = self.loop.run_until_complete(responses())
+        for worker in workers:
+            worker.cancel()
+        self.loop.run_until_complete(asyncio.wait(workers))
+        self.assertEqual(len(out), 4)
+        self.assertEqual(
+            [action for name, action in self.api.calls if name == 'lamp'],
+            ['on', 'read', 'off']
+        )
+
+
+    def test_dispatch(self):
+        """ test messages are routed by type, with unknown or malformed
+            messages going to the fallback handler """
+        handled = []
+
+        @asyncio.coroutine
+        def custom(msg):
+            handled.append(('custom', msg))
+            return ['custom']
+
+        @asyncio.coroutine
+        def fallback(msg):
+            handled.append(('fallback', msg))
+            return []
+
+        main = self.create_task(fallback=fallback)
+        main.register_handler(700, custom)
+        main.register_handler('not_configured', custom)
+        self.assertEqual(
+            sorted(main.handlers.keys()), [100, 602, 604, 700]
+        )
+        custom_msg = ',127.0.0.1,27062,127.0.0.1,27061,700,lamp'
+        unknown_msg = ',127.0.0.1,27062,127.0.0.1,27061,999,lamp'
+        self.assertEqual(
+            self.loop.run_until_complete(main.process_msg(custom_msg)),
+            ['custom']
+        )
+        self.loop.run_until_complete(main.process_msg(unknown_msg))
+        self.loop.run_until_complete(main.process_msg('garbage'))
+        self.assertEqual(
+            handled,
+            [('custom', custom_msg), ('fallback', unknown_msg), ('fallback', 'garbage')]
+        )
+        out = self.loop.run_until_complete(main.process_msg(self.set_msg('lamp', 'on')))
+        self.assertEqual(out[0].split(',')[5:8], ['605', 'lamp', 'on'])
+
+
+    def test_deadline_expiry(self):
+        """ test messages past their deadline are answered without device
+            I/O """
+        main = self.create_task(
+            deadlines={'get_device_state': 1, 'set_device_state': '1'}
+        )
+        self.assertEqual(main.deadlines, {602: 1.0, 604: 1.0})
+        self.gateway.state_cache.put('lamp', '1', '2017-10-04 07:01:03')
+        stale = time.monotonic() - 5
+        out = self.loop.run_until_complete(
+            main.process_msg(self.get_msg('lamp'), arrival=stale)
+        )
+        self.assertEqual(out[0].split(',')[5:8], ['603', 'lamp', '1'])
+        out = self.loop.run_until_complete(
+            main.process_msg(self.set_msg('lamp', 'off'), arrival=stale)
+        )
+        self.assertEqual(out[0].split(',')[5:8], ['605', 'lamp', 'expired'])
+        self.assertEqual(self.api.calls, [])
+        self.assertEqual(main.expired, {602: 1, 604: 1})
+        out = self.loop.run_until_complete(
+            main.process_msg(self.set_msg('lamp', 'off'), arrival=time.monotonic())
+        )
+        self.assertEqual(out[0].split(',')[5:8], ['605', 'lamp', 'off'])
+        self.assertEqual(self.api.calls, [('lamp', 'off')])
+
+
+    def test_sweep(self):
+        """ test the sweep polls wemo devices as they come due and carries
+            on after an unexpected error """
+        main = self.create_task()
+        main.devices = [
+            FakeDevice('lamp', '192.168.86.21'),
+            FakeDevice('fan', '192.168.86.22'),
+            FakeDevice('hall', '192.168.86.23')
+        ]
+        main.devices[2].dev_type = 'nest_thermostat'
+        for device in main.devices:
+            device.dev_status = None
+            device.dev_last_seen = '2017-10-04 07:01:03'
+        self.gateway.scheduler = PollScheduler(
+            logger=self.log,
+            interval=0.05,
+            minimum=0.05,
+            maximum=0.05
+        )
+        for device in main.devices:
+            self.gateway.scheduler.add(device.dev_name)
+        self.gateway._set_readiness('ready')
+        failures = ['fan']
+        poll_device = main.poll_device
+
+        @asyncio.coroutine
+        def flaky_poll(device, limiter):
+            if device.dev_name in failures:
+                failures.remove(device.dev_name)
+                raise RuntimeError('unexpected')
+            yield from poll_device(device, limiter)
+
+        main.poll_device = flaky_poll
+        task = asyncio.ensure_future(main.sweep_wemo())
+        self.loop.run_until_complete(asyncio.sleep(0.3))
+        task.cancel()
+        self.loop.run_until_complete(
+            asyncio.wait([task] + list(self.gateway._inflight.values()))
+        )
+        reads = collections.Counter(name for name, action in self.api.calls)
+        self.assertGreater(reads['lamp'], 1)
+        self.assertGreater(reads['fan'], 0)
+        self.assertNotIn('hall', reads)
+        self.assertEqual(main.devices[1].dev_status, '0')
+        self.assertIsNone(main.devices[2].dev_status)
+
+
+if __name__ == "__main__":
+    unittest.main()
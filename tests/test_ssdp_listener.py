@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+""" test_ssdp_listener.py:
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import logging
+import unittest
+import os
+import sys
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from bob_wemo_service.ssdp_listener import location_host_port
+from bob_wemo_service.ssdp_listener import parse_ssdp_packet
+from bob_wemo_service.ssdp_listener import SsdpListener
+from bob_wemo_service.ssdp_listener import wemo_announcement
+
+
+ALIVE = (
+    b'NOTIFY * HTTP/1.1\r\n'
+    b'HOST: 239.255.255.250:1900\r\n'
+    b'CACHE-CONTROL: max-age=86400\r\n'
+    b'LOCATION: http://192.168.86.21:49153/setup.xml\r\n'
+    b'NT: upnp:rootdevice\r\n'
+    b'NTS: ssdp:alive\r\n'
+    b'USN: uuid:Socket-1_0-221517K0101769::upnp:rootdevice\r\n'
+    b'\r\n'
+)
+
+BYEBYE = (
+    b'NOTIFY * HTTP/1.1\r\n'
+    b'HOST: 239.255.255.250:1900\r\n'
+    b'NT: upnp:rootdevice\r\n'
+    b'NTS: ssdp:byebye\r\n'
+    b'USN: uuid:Socket-1_0-221517K0101769::upnp:rootdevice\r\n'
+    b'\r\n'
+)
+
+
+# Define test class ***********************************************************
+class TestSsdpListener(unittest.TestCase):
+    """ unittests for SSDP listener Class, methods, and functions """
+
+    def __init__(self, *args, **kwargs):
+        logging.basicConfig(stream=sys.stdout)
+        self.log = logging.getLogger(__name__)
+        self.log.level = logging.DEBUG
+        super(TestSsdpListener, self).__init__(*args, **kwargs)
+
+
+    def test_parse(self):
+        """ test NOTIFY packets are parsed and other packets ignored """
+        headers = parse_ssdp_packet(ALIVE)
+        self.assertEqual(headers['nts'], 'ssdp:alive')
+        self.assertEqual(headers['location'], 'http://192.168.86.21:49153/setup.xml')
+        self.assertEqual(parse_ssdp_packet(b'M-SEARCH * HTTP/1.1\r\n\r\n'), None)
+        self.assertEqual(parse_ssdp_packet(b'HTTP/1.1 200 OK\r\n\r\n'), None)
+
+
+    def test_announcement(self):
+        """ test only wemo root device announcements are accepted """
+        self.assertEqual(
+            wemo_announcement(parse_ssdp_packet(ALIVE)),
+            (
+                'ssdp:alive',
+                'uuid:Socket-1_0-221517K0101769',
+                'http://192.168.86.21:49153/setup.xml'
+            )
+        )
+        self.assertEqual(
+            wemo_announcement(parse_ssdp_packet(BYEBYE)),
+            ('ssdp:byebye', 'uuid:Socket-1_0-221517K0101769', None)
+        )
+        # Embedded service announcements from the same device
+        service = ALIVE.replace(
+            b'NT: upnp:rootdevice', b'NT: urn:Belkin:service:basicevent:1'
+        )
+        self.assertEqual(wemo_announcement(parse_ssdp_packet(service)), None)
+        # Announcements from other vendors
+        other = ALIVE.replace(b'uuid:Socket-1_0', b'uuid:2f402f80-da50')
+        self.assertEqual(wemo_announcement(parse_ssdp_packet(other)), None)
+        # Alive announcement without a location
+        lost = ALIVE.replace(b'LOCATION: http://192.168.86.21:49153/setup.xml\r\n', b'')
+        self.assertEqual(wemo_announcement(parse_ssdp_packet(lost)), None)
+
+
+    def test_location(self):
+        """ test host and port are split out of a location """
+        self.assertEqual(
+            location_host_port('http://192.168.86.21:49153/setup.xml'),
+            ('192.168.86.21', 49153)
+        )
+
+
+    def test_callbacks(self):
+        """ test datagrams are routed to the alive and byebye callbacks """
+        alive = []
+        byebye = []
+        listener = SsdpListener(
+            lambda udn, location: alive.append((udn, location)),
+            byebye.append,
+            logger=self.log
+        )
+        listener.datagram_received(ALIVE, ('192.168.86.21', 1900))
+        listener.datagram_received(BYEBYE, ('192.168.86.21', 1900))
+        listener.datagram_received(b'\xff\xfe garbage', ('192.168.86.99', 1900))
+        self.assertEqual(
+            alive,
+            [('uuid:Socket-1_0-221517K0101769', 'http://192.168.86.21:49153/setup.xml')]
+        )
+        self.assertEqual(byebye, ['uuid:Socket-1_0-221517K0101769'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+""" test_state_cache.py:
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import logging
+import unittest
+import os
+import sys
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from bob_wemo_service.state_cache import StateCache
+
+
+# Define test class ***********************************************************
+class TestStateCache(unittest.TestCase):
+    """ unittests for StateCache Class, methods, and functions """
+
+    def __init__(self, *args, **kwargs):
+        logging.basicConfig(stream=sys.stdout)
+        self.log = logging.getLogger(__name__)
+        self.log.level = logging.DEBUG
+        super(TestStateCache, self).__init__(*args, **kwargs)
+
+
+    def setUp(self):
+        self.cache = StateCache(
+            logger=self.log,
+            default_ttl=2,
+            ttls={'WEMO_SWITCH': 5}
+        )
+        super(TestStateCache, self).setUp()
+
+
+    def test_ttl(self):
+        """ test ttl lookup by device type """
+        self.assertEqual(self.cache.ttl('wemo_switch'), 5)
+        self.assertEqual(self.cache.ttl('nest'), 2)
+        self.assertEqual(self.cache.ttl(None), 2)
+
+
+    def test_fresh_and_stale(self):
+        """ test entries are only served while fresh """
+        self.cache.put('FYLT1', 'on', '2017-10-04 07:01:03', now=100)
+        self.assertEqual(self.cache.get('fylt1', now=101).status, 'on')
+        self.assertEqual(self.cache.get('fylt1', now=103), None)
+        self.assertEqual(
+            self.cache.get('fylt1', dev_type='wemo_switch', now=103).last_seen,
+            '2017-10-04 07:01:03'
+        )
+        self.assertEqual(self.cache.get('fylt1', dev_type='wemo_switch', now=106), None)
+        self.assertEqual(self.cache.get('fylt1', now=106, ttl=300).status, 'on')
+        self.assertEqual(self.cache.last_known('fylt1').status, 'on')
+        self.assertEqual(self.cache.get('bylt1', now=100), None)
+
+
+    def test_write_through(self):
+        """ test newer writes replace older entries """
+        self.cache.put('fylt1', 'on', '2017-10-04 07:01:03', now=100)
+        self.cache.put('fylt1', 'off', '2017-10-04 07:01:04', now=101)
+        self.assertEqual(self.cache.get('fylt1', now=102).status, 'off')
+        self.assertEqual(len(self.cache), 1)
+        self.cache.invalidate('fylt1')
+        self.assertEqual(self.cache.get('fylt1', now=102), None)
+        self.assertEqual(self.cache.last_known('fylt1').status, 'off')
+        self.cache.put('fylt1', 'on', '2017-10-04 07:01:05', now=103)
+        self.assertEqual(self.cache.get('fylt1', now=103).status, 'on')
+        self.cache.invalidate('bylt1')
+        self.assertEqual(self.cache.last_known('bylt1'), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+""" test_token_bucket.py:
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import logging
+import unittest
+import os
+import sys
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from bob_wemo_service.token_bucket import RateLimiter
+
+
+# Define test class ***********************************************************
+class TestRateLimiter(unittest.TestCase):
+    """ unittests for RateLimiter Class, methods, and functions """
+
+    def __init__(self, *args, **kwargs):
+        logging.basicConfig(stream=sys.stdout)
+        self.log = logging.getLogger(__name__)
+        self.log.level = logging.DEBUG
+        super(TestRateLimiter, self).__init__(*args, **kwargs)
+
+
+    def setUp(self):
+        self.limiter = RateLimiter(logger=self.log, rate=2, burst=3)
+        super(TestRateLimiter, self).setUp()
+
+
+    def test_burst_then_rate(self):
+        """ test a burst is allowed and then refilled at the rate """
+        results = [self.limiter.allow('fylt1', now=0) for i in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+        self.assertFalse(self.limiter.allow('FYLT1', now=0.25))
+        self.assertTrue(self.limiter.allow('fylt1', now=0.5))
+        # Other devices have their own bucket
+        self.assertTrue(self.limiter.allow('bylt1', now=0.5))
+        self.assertEqual(self.limiter.counters['limited'], 2)
+
+
+    def test_reserve(self):
+        """ test commands queue up behind the tokens they reserve """
+        delays = [self.limiter.reserve('fylt1', now=0) for i in range(5)]
+        self.assertEqual(delays, [0, 0, 0, 0.5, 1.0])
+        # Reads are refused while commands hold future tokens
+        self.assertFalse(self.limiter.allow('fylt1', now=0.9))
+        self.assertTrue(self.limiter.allow('fylt1', now=1.5))
+        self.assertEqual(self.limiter.counters['delayed'], 2)
+
+
+    def test_type_bucket(self):
+        """ test a device type bucket is shared by devices of that type """
+        limiter = RateLimiter(
+            logger=self.log, rate=0, type_limits={'WEMO_SWITCH': (1, 2)}
+        )
+        self.assertTrue(limiter.allow('fylt1', dev_type='wemo_switch', now=0))
+        self.assertTrue(limiter.allow('bylt1', dev_type='wemo_switch', now=0))
+        self.assertFalse(limiter.allow('fylt1', dev_type='wemo_switch', now=0))
+        # Devices of other types are not limited at all
+        self.assertTrue(limiter.allow('fylt1', dev_type='wemo_insight', now=0))
+        self.assertEqual(limiter.reserve('fylt1', dev_type='wemo_switch', now=0), 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
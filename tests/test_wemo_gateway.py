@@ -0,0 +1,466 @@
+#!/usr/bin/python3
+""" test_wemo_gateway.py:
+"""
+
+# Import Required Libraries (Standard, Third Party, Local) ********************
+import asyncio
+import collections
+import datetime
+import logging
+import threading
+import time
+import unittest
+import os
+import sys
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from bob_wemo_service.circuit_breaker import BreakerBoard
+from bob_wemo_service.priority_slots import BACKGROUND
+from bob_wemo_service.wemo_gateway import WemoGateway
+from bob_wemo_service.wemo_result import offline
+from bob_wemo_service.wemo_result import WemoResult
+
+
+# Fake wemo API ***************************************************************
+class FakeEntry(object):
+    """ Saved registry entry """
+    def __init__(self, name):
+        self.name = name
+        self.device = None
+
+
+class FakeDevice(object):
+    """ Configured device """
+    def __init__(self, dev_name, dev_addr):
+        self.dev_name = dev_name
+        self.dev_addr = dev_addr
+        self.dev_type = 'wemo_switch'
+
+
+class FakeRegistry(object):
+    """ Saved device registry """
+    def __init__(self):
+        self.entries = []
+
+
+class FakeWemoAPI(object):
+    """ Stand-in for WemoAPI recording every device call.  Calls sleep for
+        delay seconds and report any overlap on the same device """
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.states = {}
+        self.missing = set()
+        self.unresolved = set()
+        self.discoverable = set()
+        self.discovered = []
+        self.registry = FakeRegistry()
+        self.breakers = BreakerBoard()
+        self.overlaps = 0
+        self.peak = 0
+        self._active = collections.Counter()
+        self._lock = threading.Lock()
+
+    def is_subscribed(self, name):
+        return False
+
+    def is_resolved(self, name=None, addr=None):
+        return name not in self.unresolved
+
+    def discover(self, name=None, addr=None):
+        self.discovered.append(name)
+        if name in self.missing:
+            return None
+        self.unresolved.discard(name)
+        return name
+
+    def load_registry(self):
+        return len(self.registry.entries)
+
+    def discover_all(self):
+        found = self.unresolved & self.discoverable
+        self.unresolved -= found
+        return len(found)
+
+    def connect_at(self, name=None, addr=None, port=None):
+        return self._device_call(name, 'connect', name)
+
+    def connect(self, entry):
+        self._device_call(entry.name, 'connect', None)
+        entry.device = entry.name
+        return entry.device
+
+    def _device_call(self, name, action, status):
+        if name in self.missing:
+            return offline(None, error='not found')
+        with self._lock:
+            self._active[name] += 1
+            if self._active[name] > 1:
+                self.overlaps += 1
+            self.peak = max(self.peak, sum(self._active.values()))
+            self.calls.append((name, action))
+        time.sleep(self.delay)
+        with self._lock:
+            self._active[name] -= 1
+        return WemoResult(status, str(datetime.datetime.now()), self.delay, None)
+
+    def read_status(self, name=None, addr=None, last_seen=None):
+        return self._device_call(name, 'read', self.states.get(name, '0'))
+
+    def turn_on(self, name=None, addr=None, last_seen=None):
+        self.states[name] = '1'
+        return self._device_call(name, 'on', 'on')
+
+    def turn_off(self, name=None, addr=None, last_seen=None):
+        self.states[name] = '0'
+        return self._device_call(name, 'off', 'off')
+
+
+# Define test class ***********************************************************
+class TestWemoGateway(unittest.TestCase):
+    """ unittests for WemoGateway Class, methods, and functions """
+
+    def __init__(self, *args, **kwargs):
+        logging.basicConfig(stream=sys.stdout)
+        self.log = logging.getLogger(__name__)
+        self.log.level = logging.DEBUG
+        super(TestWemoGateway, self).__init__(*args, **kwargs)
+
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        super(TestWemoGateway, self).setUp()
+
+
+    def tearDown(self):
+        self.gateway.executor.shutdown(wait=True)
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        super(TestWemoGateway, self).tearDown()
+
+
+    def create_gateway(self, delay=0.0, **settings):
+        """ Returns a gateway in front of a fake API """
+        self.api = FakeWemoAPI(delay=delay)
+        self.gateway = WemoGateway(
+            logger=self.log,
+            api=self.api,
+            loop=self.loop,
+            settings=settings
+        )
+        return self.gateway
+
+
+    def run_all(self, *coros):
+        """ Runs coroutines concurrently, in order, until all complete """
+        return self.loop.run_until_complete(asyncio.gather(*coros))
+
+
+    def test_lane_order(self):
+        """ test calls to one device run one at a time in arrival order """
+        gateway = self.create_gateway(delay=0.05)
+        self.run_all(
+            gateway.set_state(name='lamp', state='on'),
+            gateway.read_status(name='lamp', force=True),
+            gateway.set_state(name='lamp', state='off'),
+            gateway.read_status(name='fan', force=True)
+        )
+        self.assertEqual(
+            [action for name, action in self.api.calls if name == 'lamp'],
+            ['on', 'read', 'off']
+        )
+        self.assertEqual(self.api.overlaps, 0)
+
+
+    def test_timeout_keeps_lane(self):
+        """ test a timed out call still blocks the next call to its device """
+        gateway = self.create_gateway(delay=0.5, call_timeout=0.2)
+        first, second = self.run_all(
+            gateway.read_status(name='lamp', force=True),
+            gateway.set_state(name='lamp', state='on')
+        )
+        self.assertEqual(first.error, 'timed out')
+        self.assertEqual(self.api.overlaps, 0)
+        # Slot and lane are handed back once the hung call ends
+        self.assertEqual(gateway.slots.free, gateway.lane_limit - 1)
+        self.loop.run_until_complete(asyncio.sleep(0.6))
+        self.assertEqual(gateway.slots.free, gateway.lane_limit)
+        self.assertEqual(gateway._lanes, {})
+
+
+    def test_timeout_from_start(self):
+        """ test time queued for a worker thread is not counted as timeout """
+        gateway = self.create_gateway(
+            delay=0.15, call_timeout=0.25, max_workers=1, lane_limit=2
+        )
+        results = self.run_all(
+            gateway.read_status(name='lamp', force=True),
+            gateway.read_status(name='fan', force=True)
+        )
+        self.assertEqual([result.error for result in results], [None, None])
+
+
+    def test_backoff_on_discovery_failure(self):
+        """ test only devices that cannot be found back off """
+        gateway = self.create_gateway(delay=0.3, call_timeout=0.1)
+        result, = self.run_all(gateway.set_state(name='lamp', state='on'))
+        self.assertEqual(result.error, 'timed out')
+        self.assertFalse(gateway.backoff.is_blocked('lamp'))
+        self.api.missing.add('fan')
+        result, = self.run_all(gateway.read_status(name='fan', force=True))
+        self.assertEqual(result.error, 'not found')
+        self.assertTrue(gateway.backoff.is_blocked('fan'))
+
+
+    def test_cached_command_status(self):
+        """ test cached and live reads report a command the same way """
+        gateway = self.create_gateway(state_ttl=60)
+        result, = self.run_all(gateway.set_state(name='lamp', state='on'))
+        self.assertEqual(result.status, 'on')
+        cached, live = self.run_all(
+            gateway.read_status(name='lamp'),
+            gateway.read_status(name='lamp', force=True)
+        )
+        self.assertEqual(self.api.calls, [('lamp', 'on'), ('lamp', 'read')])
+        self.assertEqual(cached.status, '1')
+        self.assertEqual(live.status, '1')
+
+
+    def test_rate_limited_read_during_command(self):
+        """ test excess reads get the last known state while a command is
+            in flight """
+        gateway = self.create_gateway(delay=0.1, rate_limit=5, rate_burst=1)
+        self.run_all(gateway.read_status(name='lamp', force=True))
+        command, limited = self.run_all(
+            gateway.set_state(name='lamp', state='on'),
+            gateway.read_status(name='lamp')
+        )
+        self.assertEqual(limited.error, 'rate limited')
+        self.assertEqual(limited.status, '0')
+
+
+    def test_warm_start_yields_to_commands(self):
+        """ test saved device reconnects leave slots free for commands """
+        gateway = self.create_gateway(delay=0.1)
+        self.api.registry.entries = [FakeEntry('saved%s' % i) for i in range(12)]
+
+        @asyncio.coroutine
+        def command():
+            yield from asyncio.sleep(0.05)
+            result = yield from gateway.set_state(name='lamp', state='on')
+            return result
+
+        ready, result = self.run_all(gateway.warm_start(), command())
+        self.assertTrue(result.ok)
+        self.assertEqual(gateway.readiness, 'ready')
+        actions = [action for name, action in self.api.calls]
+        self.assertEqual(actions.count('connect'), 12)
+        self.assertLess(actions.index('on'), gateway.lane_limit)
+
+
+    def test_resolve_background_cap(self):
+        """ test start-up address resolution stays within background_limit """
+        gateway = self.create_gateway(delay=0.05, background_limit=2)
+
+        @asyncio.coroutine
+        def find_port(addr, limiter):
+            return 49153
+
+        gateway._find_port = find_port
+        devices = [
+            FakeDevice('wemo%s' % i, '192.168.1.%s' % (10 + i)) for i in range(6)
+        ]
+        results = self.run_all(
+            *[gateway._resolve_one(device, None) for device in devices]
+        )
+        self.assertEqual(results, [True] * 6)
+        self.assertEqual(self.api.peak, 2)
+
+
+    def test_single_flight(self):
+        """ test concurrent reads share one query unless a command came
+            between them """
+        gateway = self.create_gateway(delay=0.05)
+        first, second = self.run_all(
+            gateway.read_status(name='lamp', force=True),
+            gateway.read_status(name='lamp', force=True)
+        )
+        self.assertEqual(self.api.calls, [('lamp', 'read')])
+        self.assertEqual(first, second)
+        results = self.run_all(
+            gateway.read_status(name='lamp', force=True),
+            gateway.set_state(name='lamp', state='on'),
+            gateway.read_status(name='lamp', force=True)
+        )
+        self.assertEqual(
+            [action for name, action in self.api.calls[1:]],
+            ['read', 'on', 'read']
+        )
+        self.assertEqual([result.status for result in results], ['0', 'on', '1'])
+
+
+    def test_coalesce(self):
+        """ test commands within the window collapse into the last state """
+        gateway = self.create_gateway(coalesce_window=0.05)
+        results = self.run_all(
+            gateway.set_state(name='lamp', state='on'),
+            gateway.set_state(name='lamp', state='off'),
+            gateway.set_state(name='lamp', state='on'),
+            gateway.set_state(name='fan', state='off')
+        )
+        self.assertEqual(sorted(self.api.calls), [('fan', 'off'), ('lamp', 'on')])
+        self.assertEqual(
+            [result.status for result in results],
+            ['on', 'on', 'on', 'off']
+        )
+        self.assertEqual(gateway._coalescing, {})
+        self.assertEqual(gateway._lanes, {})
+
+
+    def test_read_before_command_not_cached(self):
+        """ test a read running when a command is admitted does not cache
+            the state from before the command """
+        gateway = self.create_gateway(delay=0.1, state_ttl=60)
+
+        @asyncio.coroutine
+        def late_read():
+            yield from asyncio.sleep(0.15)
+            result = yield from gateway.read_status(name='lamp')
+            return result
+
+        first, command, late = self.run_all(
+            gateway.read_status(name='lamp', force=True),
+            gateway.set_state(name='lamp', state='on'),
+            late_read()
+        )
+        self.assertEqual(first.status, '0')
+        self.assertEqual(late.status, '1')
+        self.assertEqual(
+            [action for name, action in self.api.calls],
+            ['read', 'on', 'read']
+        )
+
+
+    def test_command_not_behind_queued_poll(self):
+        """ test a command does not wait behind a poll of its device that
+            is still waiting for a background slot """
+        gateway = self.create_gateway(delay=0.2, lane_limit=4, background_limit=3)
+
+        @asyncio.coroutine
+        def command():
+            yield from asyncio.sleep(0.05)
+            start = time.monotonic()
+            result = yield from gateway.set_state(name='lamp', state='on')
+            return result, time.monotonic() - start
+
+        results = self.run_all(
+            *[
+                gateway.read_status(name=name, force=True, priority=BACKGROUND)
+                for name in ['a', 'b', 'c', 'lamp']
+            ] + [command()]
+        )
+        result, latency = results[-1]
+        self.assertTrue(result.ok)
+        self.assertLess(latency, 0.35)
+        self.assertEqual(
+            [action for name, action in self.api.calls if name == 'lamp'],
+            ['on', 'read']
+        )
+        self.assertEqual(results[3].status, '1')
+        self.assertEqual(gateway.slots.free, gateway.lane_limit)
+
+
+    def test_discovery_clears_backoff(self):
+        """ test a device missed by the address probe but found by network
+            discovery is not left backing off """
+        gateway = self.create_gateway()
+        gateway.devices = [FakeDevice('lamp', '192.168.1.10')]
+        self.api.unresolved.add('lamp')
+        self.api.discoverable.add('lamp')
+
+        @asyncio.coroutine
+        def find_port(addr, limiter):
+            return None
+
+        gateway._find_port = find_port
+        self.run_all(gateway.warm_start())
+        self.assertNotIn('lamp', gateway.backoff)
+        result, = self.run_all(gateway.set_state(name='lamp', state='on'))
+        self.assertTrue(result.ok)
+
+
+    def test_retry_skips_resolved(self):
+        """ test the retry task clears resolved devices without probing """
+        gateway = self.create_gateway(backoff_initial=0.05, backoff_jitter=0)
+        gateway._set_readiness('ready')
+        gateway.backoff.record_failure('lamp', addr='192.168.1.10')
+        gateway.backoff.record_failure('fan', addr='192.168.1.11')
+        self.api.unresolved.add('fan')
+        self.api.missing.add('fan')
+        task = asyncio.ensure_future(gateway.retry_offline())
+        self.loop.run_until_complete(asyncio.sleep(0.1))
+        task.cancel()
+        self.loop.run_until_complete(asyncio.wait([task]))
+        self.assertNotIn('lamp', gateway.backoff)
+        self.assertIn('fan', gateway.backoff)
+        self.assertNotIn('lamp', self.api.discovered)
+        self.assertIn('fan', self.api.discovered)
+
+
+    def test_starting_up(self):
+        """ test unresolved devices are reported offline during start-up
+            with a single background discovery, while commands still go
+            through """
+        gateway = self.create_gateway()
+        self.api.unresolved.update(['lamp', 'fan'])
+        reads = self.run_all(
+            gateway.read_status(name='lamp', force=True),
+            gateway.read_status(name='lamp', force=True),
+            gateway.read_status(name='lamp', force=True)
+        )
+        self.assertEqual([read.error for read in reads], ['starting up'] * 3)
+        self.assertIn('lamp', gateway._resolving)
+        self.loop.run_until_complete(asyncio.wait(list(gateway._resolving.values())))
+        self.assertEqual(self.api.discovered, ['lamp'])
+        self.assertEqual(gateway._resolving, {})
+        result, = self.run_all(gateway.read_status(name='lamp', force=True))
+        self.assertTrue(result.ok)
+        result, = self.run_all(gateway.set_state(name='fan', state='on'))
+        self.assertEqual(result.status, 'on')
+        self.assertEqual(self.api.calls, [('lamp', 'read'), ('fan', 'on')])
+        self.assertEqual(self.api.discovered, ['lamp'])
+        self.assertEqual(gateway.readiness, 'starting')
+
+
+    def test_deadline_at_grant(self):
+        """ test requests that expire while waiting for the device lane are
+            answered without device I/O """
+        gateway = self.create_gateway(delay=0.2)
+        gateway.state_cache.put('lamp', '1', '2017-10-04 07:01:03')
+
+        @asyncio.coroutine
+        def late(coro):
+            yield from asyncio.sleep(0.01)
+            result = yield from coro
+            return result
+
+        deadline = time.monotonic() + 0.1
+        first, command, read = self.run_all(
+            gateway.set_state(name='lamp', state='on'),
+            late(gateway.set_state(name='lamp', state='off', deadline=deadline)),
+            late(gateway.read_status(name='lamp', force=True, deadline=deadline))
+        )
+        self.assertEqual(first.status, 'on')
+        self.assertEqual(command.status, 'expired')
+        self.assertEqual(read.error, 'expired')
+        self.assertEqual(self.api.calls, [('lamp', 'on')])
+        self.assertEqual(gateway.expired, {'command': 1, 'read': 1})
+        result, = self.run_all(
+            gateway.set_state(name='lamp', state='off', deadline=time.monotonic() + 1)
+        )
+        self.assertEqual(result.status, 'off')
+
+
+if __name__ == "__main__":
+    unittest.main()